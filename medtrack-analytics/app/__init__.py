@@ -3,18 +3,27 @@ import logging
 import os
 
 from flask import Flask
+from flask_caching import Cache
+from flask_compress import Compress
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 
+from app.session import REPLICA_BIND, RoutingSession
+
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 cors = CORS()
+cache = Cache()
+compress = Compress()
 
 
 def create_app():
     """Application factory pattern"""
     app = Flask(__name__)
 
+    from app.json_provider import OrjsonProvider
+    app.json = OrjsonProvider(app)
+
     # Basic logging configuration
     logging.basicConfig(
         level=logging.INFO,
@@ -24,11 +33,32 @@ def create_app():
     # Configuration
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 20)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 40)),
+        'pool_pre_ping': True,
+        'pool_recycle': 300,
+        'pool_use_lifo': True,
+        'query_cache_size': 1200,
+        # psycopg2: page executemany INSERTs into multi-row VALUES and batch executemany UPDATEs
+        'executemany_mode': 'values_plus_batch',
+        'insertmanyvalues_page_size': 1000,
+    }
+    if os.getenv('REPLICA_URL'):
+        # Read-only routes are served from the replica when one is configured
+        app.config['SQLALCHEMY_BINDS'] = {REPLICA_BIND: os.getenv('REPLICA_URL')}
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+    app.config['CACHE_TYPE'] = 'RedisCache' if os.getenv('REDIS_URL') else 'SimpleCache'
+    app.config['CACHE_REDIS_URL'] = os.getenv('REDIS_URL')
+    app.config['CACHE_DEFAULT_TIMEOUT'] = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 60))
+    app.config['COMPRESS_MIN_SIZE'] = 500
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
 
     # Initialize extensions
     db.init_app(app)
     cors.init_app(app)
+    cache.init_app(app)
+    compress.init_app(app)
 
     # Import models to register with SQLAlchemy
     from app import models  # noqa: F401
@@ -51,8 +81,24 @@ def create_app():
     def health_check():
         return {'status': 'healthy', 'service': 'MedTrack Analytics API'}
 
-    # Ensure tables exist at startup
-    with app.app_context():
+    # Schema creation is a deploy-time step (`flask create-db`); only run it
+    # on every startup when explicitly enabled for local development
+    @app.cli.command('create-db')
+    def create_db():
+        """Create database tables"""
         db.create_all()
 
+    # create-db never alters existing tables; upgrade-db adds the columns,
+    # defaults, constraints, indexes and views later model changes introduced
+    @app.cli.command('upgrade-db')
+    def upgrade_db():
+        """Upgrade an existing database to the current models"""
+        from app.models.schema_upgrade import upgrade_schema
+        with db.engine.begin() as connection:
+            upgrade_schema(connection)
+
+    if os.getenv('AUTO_CREATE_TABLES', 'False').lower() == 'true':
+        with app.app_context():
+            db.create_all()
+
     return app
@@ -1,101 +1,188 @@
-def analytics_root():
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, timedelta
 
-from flask import Blueprint, jsonify, request
-from sqlalchemy import case, func
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import Float, Integer, Text, case, cast, event, func, select, text, true
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 
-from app import db
+from app import cache, db
+from app.api.caching import is_success
+from app.session import RoutingSession, mark_read_only, mark_strict_loading
 from app.models.drug import Drug
 from app.models.patient import Patient
 from app.models.prescription import Prescription
 from app.models.sale import Sale
+from app.models.sales_daily import current_sales_daily
 
 analytics_bp = Blueprint('analytics', __name__)
 logger = logging.getLogger(__name__)
 
+DASHBOARD_CACHE_KEY = 'analytics_dashboard'
+
+# Shared pool for running independent aggregate queries concurrently
+_query_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='analytics-query')
+
+
+@analytics_bp.before_request
+def _use_read_replica():
+    """Analytics endpoints only read, so serve them from the replica"""
+    mark_read_only()
+    mark_strict_loading()
+
+
+@event.listens_for(Sale, 'after_insert')
+@event.listens_for(Sale, 'after_update')
+@event.listens_for(Sale, 'after_delete')
+@event.listens_for(Drug, 'after_insert')
+@event.listens_for(Drug, 'after_update')
+@event.listens_for(Drug, 'after_delete')
+def _invalidate_analytics_cache(mapper, connection, target):
+    """Drop cached dashboard and forecasts whenever sales or inventory change"""
+    cache.delete(DASHBOARD_CACHE_KEY)
+    cache.delete_memoized(_compute_forecast)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _invalidate_analytics_cache_on_bulk_write(orm_execute_state):
+    """Bulk INSERT/UPDATE/DELETE statements skip mapper events, so invalidate here too"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (Sale, Drug):
+        _invalidate_analytics_cache(mapper, None, None)
+
+
+def _run_in_app_context(app, fn, *args):
+    """Run a read-only fn inside its own app context so it gets a dedicated session"""
+    with app.app_context():
+        mark_read_only()
+        mark_strict_loading()
+        return fn(*args)
+
+
+def _fetch_dashboard_summary(last_30_days):
+    """Sales, inventory and patient summaries as a single row
+
+    Sales figures come from the mv_sales_daily rollup, with every day since
+    its last refresh aggregated live; sales dated before that refresh show up
+    once the view is refreshed again.
+    """
+    # The three scalar summaries are independent single-row aggregates,
+    # so fetch them as CTEs of one statement instead of three round-trips
+    sales_cte = db.session.query(
+        cast(func.sum(current_sales_daily.c.transactions), Integer).label('total_sales'),
+        cast(func.sum(current_sales_daily.c.revenue), Float).label('total_revenue'),
+        cast(func.sum(current_sales_daily.c.quantity), Integer).label('total_quantity'),
+        cast(
+            func.sum(current_sales_daily.c.revenue) / func.nullif(func.sum(current_sales_daily.c.transactions), 0),
+            Float
+        ).label('avg_sale_value')
+    ).filter(current_sales_daily.c.sale_date >= last_30_days).cte('sales_summary')
+
+    inventory_cte = db.session.query(
+        func.count(Drug.id).label('total_drugs'),
+        func.sum(Drug.stock_quantity).label('total_stock'),
+        cast(func.sum(Drug.stock_value), Float).label('total_inventory_value'),
+        func.count(case((Drug.stock_quantity <= Drug.min_stock_level * 1.5, 1))).label('low_stock_count')
+    ).cte('inventory_summary')
+
+    patient_cte = db.session.query(
+        func.count(Patient.id).label('total_patients'),
+        cast(func.avg(Patient.age), Float).label('avg_age'),
+        func.count(case((Patient.gender == 'Male', 1))).label('male_count'),
+        func.count(case((Patient.gender == 'Female', 1))).label('female_count')
+    ).cte('patient_summary')
+
+    return db.session.query(sales_cte, inventory_cte, patient_cte) \
+        .select_from(sales_cte) \
+        .join(inventory_cte, true()) \
+        .join(patient_cte, true()).first()
+
+
+def _fetch_daily_sales(week_start, today):
+    """Revenue and transaction counts per day within the window"""
+    return db.session.query(
+        current_sales_daily.c.sale_date,
+        cast(func.sum(current_sales_daily.c.revenue), Float).label('revenue'),
+        cast(func.sum(current_sales_daily.c.transactions), Integer).label('transactions')
+    ).filter(current_sales_daily.c.sale_date >= week_start, current_sales_daily.c.sale_date <= today) \
+     .group_by(current_sales_daily.c.sale_date).all()
+
+
+def _fetch_top_categories(last_30_days):
+    """Top five categories by recent revenue"""
+    return db.session.query(
+        Drug.category,
+        cast(func.sum(current_sales_daily.c.transactions), Integer).label('sales_count'),
+        cast(func.sum(current_sales_daily.c.revenue), Float).label('revenue'),
+        cast(func.sum(current_sales_daily.c.quantity), Integer).label('quantity')
+    ).join(current_sales_daily, current_sales_daily.c.drug_id == Drug.id) \
+     .filter(current_sales_daily.c.sale_date >= last_30_days) \
+     .group_by(Drug.category) \
+     .order_by(func.sum(current_sales_daily.c.revenue).desc()) \
+     .limit(5).all()
+
 
 @analytics_bp.route('/analytics/dashboard', methods=['GET'])
+@cache.cached(timeout=60, key_prefix=DASHBOARD_CACHE_KEY, response_filter=is_success)
 def get_dashboard_analytics():
     """Get comprehensive dashboard analytics"""
     try:
         today = date.today()
         last_30_days = today - timedelta(days=30)
+        week_start = today - timedelta(days=6)
+
+        # The dashboard queries are independent, so run them concurrently
+        app = current_app._get_current_object()
+        summary_future = _query_executor.submit(_run_in_app_context, app, _fetch_dashboard_summary, last_30_days)
+        daily_future = _query_executor.submit(_run_in_app_context, app, _fetch_daily_sales, week_start, today)
+        categories_future = _query_executor.submit(_run_in_app_context, app, _fetch_top_categories, last_30_days)
 
-        sales_summary = db.session.query(
-            func.count(Sale.id).label('total_sales'),
-            func.sum(Sale.total_amount).label('total_revenue'),
-            func.sum(Sale.quantity).label('total_quantity'),
-            func.avg(Sale.total_amount).label('avg_sale_value')
-        ).filter(Sale.sale_date >= last_30_days).first()
-
-        inventory_summary = db.session.query(
-            func.count(Drug.id).label('total_drugs'),
-            func.sum(Drug.stock_quantity).label('total_stock'),
-            func.sum(Drug.stock_quantity * Drug.unit_price).label('total_inventory_value'),
-            func.count(case([(Drug.stock_quantity <= Drug.min_stock_level * 1.5, 1)])).label('low_stock_count')
-        ).first()
-
-        patient_summary = db.session.query(
-            func.count(Patient.id).label('total_patients'),
-            func.avg(Patient.age).label('avg_age'),
-            func.count(case([(Patient.gender == 'Male', 1)])).label('male_count'),
-            func.count(case([(Patient.gender == 'Female', 1)])).label('female_count')
-        ).first()
-
-        daily_sales = {}
-        for single_date in [today - timedelta(days=i) for i in range(6, -1, -1)]:
-            day_sales = db.session.query(
-                func.sum(Sale.total_amount).label('revenue'),
-                func.count(Sale.id).label('transactions')
-            ).filter(Sale.sale_date == single_date).first()
-
-            daily_sales[single_date.isoformat()] = {
-                'revenue': float(day_sales[0]) if day_sales[0] else 0,
-                'transactions': day_sales[1] if day_sales[1] else 0
+        summary = summary_future.result()
+
+        # Pre-fill every day of the window so days without sales report zero
+        daily_sales = {
+            (today - timedelta(days=i)).isoformat(): {'revenue': 0, 'transactions': 0}
+            for i in range(6, -1, -1)
+        }
+        for sale_date, revenue, transactions in daily_future.result():
+            daily_sales[sale_date.isoformat()] = {
+                'revenue': revenue or 0,
+                'transactions': transactions or 0
             }
 
-        top_categories = db.session.query(
-            Drug.category,
-            func.count(Sale.id).label('sales_count'),
-            func.sum(Sale.total_amount).label('revenue'),
-            func.sum(Sale.quantity).label('quantity')
-        ).join(Sale, Sale.drug_id == Drug.id) \
-         .filter(Sale.sale_date >= last_30_days) \
-         .group_by(Drug.category) \
-         .order_by(func.sum(Sale.total_amount).desc()) \
-         .limit(5).all()
-
-        top_categories_list = []
-        for cat in top_categories:
-            top_categories_list.append({
+        top_categories_list = [
+            {
                 'category': cat[0] or 'Uncategorized',
                 'sales_count': cat[1],
-                'revenue': float(cat[2]) if cat[2] else 0,
-                'quantity': cat[3] if cat[3] else 0
-            })
+                'revenue': cat[2] or 0,
+                'quantity': cat[3] or 0
+            }
+            for cat in categories_future.result()
+        ]
 
         return jsonify({
             'success': True,
             'dashboard': {
                 'sales_summary': {
-                    'total_sales': sales_summary[0] if sales_summary[0] else 0,
-                    'total_revenue': float(sales_summary[1]) if sales_summary[1] else 0,
-                    'total_quantity': sales_summary[2] if sales_summary[2] else 0,
-                    'avg_sale_value': float(sales_summary[3]) if sales_summary[3] else 0,
+                    'total_sales': summary.total_sales or 0,
+                    'total_revenue': summary.total_revenue or 0,
+                    'total_quantity': summary.total_quantity or 0,
+                    'avg_sale_value': summary.avg_sale_value or 0,
                     'period': 'last_30_days'
                 },
                 'inventory_summary': {
-                    'total_drugs': inventory_summary[0] if inventory_summary[0] else 0,
-                    'total_stock': inventory_summary[1] if inventory_summary[1] else 0,
-                    'inventory_value': float(inventory_summary[2]) if inventory_summary[2] else 0,
-                    'low_stock_count': inventory_summary[3] if inventory_summary[3] else 0
+                    'total_drugs': summary.total_drugs or 0,
+                    'total_stock': summary.total_stock or 0,
+                    'inventory_value': summary.total_inventory_value or 0,
+                    'low_stock_count': summary.low_stock_count or 0
                 },
                 'patient_summary': {
-                    'total_patients': patient_summary[0] if patient_summary[0] else 0,
-                    'avg_age': float(patient_summary[1]) if patient_summary[1] else 0,
-                    'male_count': patient_summary[2] if patient_summary[2] else 0,
-                    'female_count': patient_summary[3] if patient_summary[3] else 0
+                    'total_patients': summary.total_patients or 0,
+                    'avg_age': summary.avg_age or 0,
+                    'male_count': summary.male_count or 0,
+                    'female_count': summary.female_count or 0
                 },
                 'recent_sales_trend': daily_sales,
                 'top_categories': top_categories_list,
@@ -108,57 +195,76 @@ def get_dashboard_analytics():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def _json_rows(subquery, order_by, **fields):
+    """Scalar subquery aggregating subquery rows into a JSON array"""
+    row = func.json_build_object(*[part for item in fields.items() for part in item])
+    return select(
+        func.coalesce(func.json_agg(aggregate_order_by(row, *order_by)), text("'[]'::json"))
+    ).select_from(subquery).scalar_subquery()
+
+
 @analytics_bp.route('/analytics/patient-demographics', methods=['GET'])
+@cache.cached(timeout=300, key_prefix='analytics_patient_demographics', response_filter=is_success)
 def get_patient_demographics():
     """Get patient demographic analysis"""
     try:
+        # PostgreSQL builds the whole payload, so the response body is the
+        # single JSON document it returns
         age_groups = db.session.query(
-            case([
+            case(
                 (Patient.age < 18, 'Under 18'),
                 (Patient.age.between(18, 30), '18-30'),
                 (Patient.age.between(31, 45), '31-45'),
                 (Patient.age.between(46, 60), '46-60'),
                 (Patient.age > 60, 'Over 60')
-            ]).label('age_group'),
+            ).label('age_group'),
             func.count(Patient.id).label('count'),
-            func.avg(Patient.age).label('avg_age')
-        ).group_by('age_group').order_by('age_group').all()
+            cast(func.avg(Patient.age), Float).label('avg_age')
+        ).group_by('age_group').subquery()
 
         top_conditions = db.session.query(
             Patient.primary_condition,
             func.count(Patient.id).label('patient_count'),
-            func.avg(Patient.age).label('avg_age')
+            cast(func.avg(Patient.age), Float).label('avg_age')
         ).filter(Patient.primary_condition.isnot(None)) \
          .group_by(Patient.primary_condition) \
          .order_by(func.count(Patient.id).desc()) \
-         .limit(10).all()
+         .limit(10).subquery()
 
         geographic = db.session.query(
             Patient.state,
             func.count(Patient.id).label('patient_count'),
-            func.avg(Patient.age).label('avg_age')
+            cast(func.avg(Patient.age), Float).label('avg_age')
         ).filter(Patient.state.isnot(None)) \
          .group_by(Patient.state) \
          .order_by(func.count(Patient.id).desc()) \
-         .limit(10).all()
-
-        return jsonify({
-            'success': True,
-            'demographics': {
-                'age_distribution': [
-                    {'age_group': ag[0] or 'Unknown', 'count': ag[1], 'avg_age': float(ag[2]) if ag[2] else 0}
-                    for ag in age_groups
-                ],
-                'top_conditions': [
-                    {'condition': tc[0], 'patient_count': tc[1], 'avg_age': float(tc[2]) if tc[2] else 0}
-                    for tc in top_conditions
-                ],
-                'geographic_distribution': [
-                    {'state': g[0], 'patient_count': g[1], 'avg_age': float(g[2]) if g[2] else 0}
-                    for g in geographic
-                ]
-            }
-        }), 200
+         .limit(10).subquery()
+
+        payload = db.session.execute(select(cast(func.json_build_object(
+            'success', true(),
+            'demographics', func.json_build_object(
+                'age_distribution', _json_rows(
+                    age_groups, [age_groups.c.age_group],
+                    age_group=func.coalesce(age_groups.c.age_group, 'Unknown'),
+                    count=age_groups.c.count,
+                    avg_age=func.coalesce(age_groups.c.avg_age, 0)
+                ),
+                'top_conditions', _json_rows(
+                    top_conditions, [top_conditions.c.patient_count.desc()],
+                    condition=top_conditions.c.primary_condition,
+                    patient_count=top_conditions.c.patient_count,
+                    avg_age=func.coalesce(top_conditions.c.avg_age, 0)
+                ),
+                'geographic_distribution', _json_rows(
+                    geographic, [geographic.c.patient_count.desc()],
+                    state=geographic.c.state,
+                    patient_count=geographic.c.patient_count,
+                    avg_age=func.coalesce(geographic.c.avg_age, 0)
+                )
+            )
+        ), Text))).scalar()
+
+        return current_app.response_class(payload, mimetype='application/json'), 200
 
     except Exception as e:
         logger.error(f"Error analyzing patient demographics: {str(e)}")
@@ -166,6 +272,7 @@ def get_patient_demographics():
 
 
 @analytics_bp.route('/analytics/prescription-patterns', methods=['GET'])
+@cache.cached(timeout=300, key_prefix='analytics_prescription_patterns', response_filter=is_success)
 def get_prescription_patterns():
     """Analyze prescription patterns"""
     try:
@@ -181,7 +288,7 @@ def get_prescription_patterns():
             Drug.category,
             func.count(Prescription.id).label('prescription_count'),
             func.count(func.distinct(Prescription.patient_id)).label('unique_patients'),
-            func.avg(Prescription.duration_days).label('avg_duration')
+            cast(func.avg(Prescription.duration_days), Float).label('avg_duration')
         ).join(Drug, Prescription.drug_id == Drug.id) \
          .group_by(Drug.drug_name, Drug.category) \
          .order_by(func.count(Prescription.id).desc()) \
@@ -210,7 +317,7 @@ def get_prescription_patterns():
                         'category': tp[1],
                         'prescription_count': tp[2],
                         'unique_patients': tp[3],
-                        'avg_duration_days': float(tp[4]) if tp[4] else 0
+                        'avg_duration_days': tp[4] or 0
                     }
                     for tp in top_prescribed
                 ],
@@ -231,15 +338,30 @@ def get_prescription_patterns():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def _days_to_expiry(expiry_date, today):
+    """Whole days until expiry, or None when unknown or already expired"""
+    if expiry_date is None:
+        return None
+    return max((expiry_date - today).days, 0) or None
+
+
 @analytics_bp.route('/analytics/inventory-health', methods=['GET'])
 def get_inventory_health():
     """Analyze inventory health metrics"""
     try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        offset = max(int(request.args.get('offset', 0)), 0)
+
+        today = date.today()
+        expiring_cutoff = today + timedelta(days=30)
+        sales_window_start = today - timedelta(days=90)
+
         recent_sales = db.session.query(
             Sale.drug_id,
             func.sum(Sale.quantity).label('sold_quantity')
-        ).filter(Sale.sale_date >= date.today() - timedelta(days=90)) \
+        ).filter(Sale.sale_date >= sales_window_start) \
          .group_by(Sale.drug_id).subquery()
+        sold_quantity = func.coalesce(recent_sales.c.sold_quantity, 0)
 
         inventory_health = db.session.query(
             Drug.id,
@@ -247,37 +369,38 @@ def get_inventory_health():
             Drug.stock_quantity,
             Drug.min_stock_level,
             Drug.max_stock_level,
-            func.coalesce(recent_sales.c.sold_quantity, 0).label('recent_sales'),
-            case([
+            sold_quantity.label('recent_sales'),
+            case(
                 (Drug.stock_quantity <= Drug.min_stock_level, 'Critical'),
                 (Drug.stock_quantity <= Drug.min_stock_level * 1.5, 'Low'),
                 (Drug.stock_quantity >= Drug.max_stock_level * 0.9, 'High'),
-                (Drug.expiry_date < date.today() + timedelta(days=30), 'Expiring'),
-                (True, 'Healthy')
-            ]).label('health_status'),
-            case([
-                (Drug.expiry_date < date.today(), 0),
-                (Drug.expiry_date >= date.today(), func.extract('day', Drug.expiry_date - date.today()))
-            ]).label('days_to_expiry')
+                (Drug.expiry_date < expiring_cutoff, 'Expiring'),
+                else_='Healthy'
+            ).label('health_status'),
+            Drug.expiry_date,
+            cast(case(
+                (Drug.max_stock_level > 0, func.round(Drug.stock_quantity * 100.0 / Drug.max_stock_level, 2)),
+                else_=0
+            ), Float).label('stock_percentage'),
+            cast(case(
+                (Drug.stock_quantity > 0, func.round(sold_quantity * 100.0 / Drug.stock_quantity, 2)),
+                else_=0
+            ), Float).label('turnover_rate')
         ).outerjoin(recent_sales, Drug.id == recent_sales.c.drug_id) \
          .filter(Drug.stock_quantity > 0) \
-         .order_by(Drug.stock_quantity.asc()) \
-         .limit(50).all()
+         .order_by(Drug.stock_quantity.asc(), Drug.id) \
+         .limit(limit).offset(offset).all()
 
         health_summary = db.session.query(
-            func.count(case([(Drug.stock_quantity <= Drug.min_stock_level, 1)])).label('critical'),
-            func.count(case([(Drug.stock_quantity <= Drug.min_stock_level * 1.5, 1)])).label('low'),
-            func.count(case([(Drug.stock_quantity >= Drug.max_stock_level * 0.9, 1)])).label('high'),
-            func.count(case([(Drug.expiry_date < date.today() + timedelta(days=30), 1)])).label('expiring_soon'),
+            func.count(case((Drug.stock_quantity <= Drug.min_stock_level, 1))).label('critical'),
+            func.count(case((Drug.stock_quantity <= Drug.min_stock_level * 1.5, 1))).label('low'),
+            func.count(case((Drug.stock_quantity >= Drug.max_stock_level * 0.9, 1))).label('high'),
+            func.count(case((Drug.expiry_date < expiring_cutoff, 1))).label('expiring_soon'),
             func.count(Drug.id).label('total')
         ).filter(Drug.stock_quantity > 0).first()
 
-        health_items = []
-        for ih in inventory_health:
-            stock_percentage = (ih[2] * 100.0 / ih[4]) if ih[4] > 0 else 0
-            turnover_rate = (ih[5] * 100.0 / ih[2]) if ih[2] > 0 else 0
-
-            health_items.append({
+        health_items = [
+            {
                 'drug_id': ih[0],
                 'drug_name': ih[1],
                 'stock_quantity': ih[2],
@@ -285,10 +408,12 @@ def get_inventory_health():
                 'max_level': ih[4],
                 'recent_sales': ih[5],
                 'health_status': ih[6],
-                'days_to_expiry': ih[7] if ih[7] else None,
-                'stock_percentage': round(stock_percentage, 2),
-                'turnover_rate': round(turnover_rate, 2)
-            })
+                'days_to_expiry': _days_to_expiry(ih[7], today),
+                'stock_percentage': ih[8],
+                'turnover_rate': ih[9]
+            }
+            for ih in inventory_health
+        ]
 
         return jsonify({
             'success': True,
@@ -301,7 +426,9 @@ def get_inventory_health():
                     'total': health_summary[4],
                     'healthy': health_summary[4] - (health_summary[0] + health_summary[1] + health_summary[2] + health_summary[3])
                 },
-                'items': health_items
+                'items': health_items,
+                'limit': limit,
+                'offset': offset
             }
         }), 200
 
@@ -310,50 +437,56 @@ def get_inventory_health():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@cache.memoize(timeout=120)
+def _compute_forecast(days_to_forecast):
+    """Drugs whose supply runs out within the forecast window"""
+    sales_rate_query = db.session.query(
+        Sale.drug_id,
+        func.sum(Sale.quantity).label('total_sold'),
+        func.count(Sale.id).label('sale_count'),
+        (func.sum(Sale.quantity) / 90.0).label('daily_sales_rate')
+    ).filter(Sale.sale_date >= date.today() - timedelta(days=90)) \
+     .group_by(Sale.drug_id).subquery()
+
+    forecast = db.session.query(
+        Drug.id,
+        Drug.drug_name,
+        Drug.stock_quantity,
+        Drug.min_stock_level,
+        cast(func.coalesce(sales_rate_query.c.daily_sales_rate, 0.1), Float).label('daily_sales_rate'),
+        func.coalesce(sales_rate_query.c.total_sold, 0).label('recent_sales'),
+        cast(case(
+            (Drug.stock_quantity <= 0, 0),
+            (sales_rate_query.c.daily_sales_rate <= 0, Drug.stock_quantity / 0.1),
+            else_=Drug.stock_quantity / sales_rate_query.c.daily_sales_rate
+        ), Float).label('days_of_supply')
+    ).outerjoin(sales_rate_query, Drug.id == sales_rate_query.c.drug_id) \
+     .filter(Drug.stock_quantity > 0) \
+     .order_by('days_of_supply').all()
+
+    at_risk_drugs = []
+    for f in forecast:
+        days_of_supply = f[6] or 0
+        if days_of_supply <= days_to_forecast:
+            at_risk_drugs.append({
+                'drug_id': f[0],
+                'drug_name': f[1],
+                'current_stock': f[2],
+                'min_level': f[3],
+                'daily_sales_rate': f[4],
+                'recent_sales': f[5],
+                'days_of_supply': round(days_of_supply, 1),
+                'risk_level': 'High' if days_of_supply <= 7 else 'Medium' if days_of_supply <= 14 else 'Low'
+            })
+    return at_risk_drugs
+
+
 @analytics_bp.route('/analytics/predictive/low-stock-forecast', methods=['GET'])
 def predict_low_stock():
     """Predict which drugs will run low based on sales trends"""
     try:
         days_to_forecast = int(request.args.get('days', 30))
-
-        sales_rate_query = db.session.query(
-            Sale.drug_id,
-            func.sum(Sale.quantity).label('total_sold'),
-            func.count(Sale.id).label('sale_count'),
-            (func.sum(Sale.quantity) / 90.0).label('daily_sales_rate')
-        ).filter(Sale.sale_date >= date.today() - timedelta(days=90)) \
-         .group_by(Sale.drug_id).subquery()
-
-        forecast = db.session.query(
-            Drug.id,
-            Drug.drug_name,
-            Drug.stock_quantity,
-            Drug.min_stock_level,
-            func.coalesce(sales_rate_query.c.daily_sales_rate, 0.1).label('daily_sales_rate'),
-            func.coalesce(sales_rate_query.c.total_sold, 0).label('recent_sales'),
-            case([
-                (Drug.stock_quantity <= 0, 0),
-                (sales_rate_query.c.daily_sales_rate <= 0, Drug.stock_quantity / 0.1),
-                (True, Drug.stock_quantity / sales_rate_query.c.daily_sales_rate)
-            ]).label('days_of_supply')
-        ).outerjoin(sales_rate_query, Drug.id == sales_rate_query.c.drug_id) \
-         .filter(Drug.stock_quantity > 0) \
-         .order_by('days_of_supply').all()
-
-        at_risk_drugs = []
-        for f in forecast:
-            days_of_supply = float(f[6]) if f[6] else 0
-            if days_of_supply <= days_to_forecast:
-                at_risk_drugs.append({
-                    'drug_id': f[0],
-                    'drug_name': f[1],
-                    'current_stock': f[2],
-                    'min_level': f[3],
-                    'daily_sales_rate': float(f[4]),
-                    'recent_sales': f[5],
-                    'days_of_supply': round(days_of_supply, 1),
-                    'risk_level': 'High' if days_of_supply <= 7 else 'Medium' if days_of_supply <= 14 else 'Low'
-                })
+        at_risk_drugs = _compute_forecast(days_to_forecast)
 
         return jsonify({
             'success': True,
@@ -406,7 +539,7 @@ def generate_sales_summary_report(start_date, end_date):
     daily_breakdown = db.session.query(
         Sale.sale_date,
         func.count(Sale.id).label('transaction_count'),
-        func.sum(Sale.total_amount).label('daily_revenue'),
+        cast(func.sum(Sale.total_amount), Float).label('daily_revenue'),
         func.sum(Sale.quantity).label('daily_quantity')
     ).filter(
         Sale.sale_date >= start_date,
@@ -424,8 +557,8 @@ def generate_sales_summary_report(start_date, end_date):
             {
                 'date': sd[0].isoformat(),
                 'transaction_count': sd[1],
-                'revenue': float(sd[2]) if sd[2] else 0,
-                'quantity': sd[3] if sd[3] else 0
+                'revenue': sd[2] or 0,
+                'quantity': sd[3] or 0
             }
             for sd in daily_breakdown
         ]
@@ -434,45 +567,67 @@ def generate_sales_summary_report(start_date, end_date):
 
 def generate_inventory_valuation_report():
     """Helper: inventory valuation report"""
-    drugs = Drug.query.filter(Drug.stock_quantity > 0).all()
-
-    total_value = 0
-    by_category = {}
-
-    for drug in drugs:
-        drug_value = drug.get_stock_value()
-        total_value += drug_value
-
-        category = drug.category or 'Uncategorized'
-        if category not in by_category:
-            by_category[category] = {
-                'count': 0,
-                'total_quantity': 0,
-                'total_value': 0,
-                'drugs': []
-            }
+    category = func.coalesce(Drug.category, 'Uncategorized')
+    category_totals = db.session.query(
+        category.label('category'),
+        func.count(Drug.id).label('count'),
+        func.sum(Drug.stock_quantity).label('total_quantity'),
+        cast(func.sum(Drug.stock_value), Float).label('total_value')
+    ).filter(Drug.stock_quantity > 0) \
+     .group_by(category).all()
+
+    drug_rows = db.session.execute(
+        select(
+            category.label('category'),
+            Drug.drug_name,
+            Drug.stock_quantity,
+            cast(Drug.unit_price, Float).label('unit_price'),
+            cast(Drug.stock_value, Float).label('total_value')
+        ).where(Drug.stock_quantity > 0)
+         .order_by(category, Drug.id)
+         .execution_options(yield_per=1000)
+    )
+
+    by_category = {
+        ct.category: {
+            'count': ct.count,
+            'total_quantity': ct.total_quantity,
+            'total_value': ct.total_value,
+            'drugs': []
+        }
+        for ct in category_totals
+    }
 
-        by_category[category]['count'] += 1
-        by_category[category]['total_quantity'] += drug.stock_quantity
-        by_category[category]['total_value'] += drug_value
-        by_category[category]['drugs'].append({
-            'drug_name': drug.drug_name,
-            'stock_quantity': drug.stock_quantity,
-            'unit_price': float(drug.unit_price) if drug.unit_price else 0,
-            'total_value': drug_value
+    for row in drug_rows:
+        by_category[row.category]['drugs'].append({
+            'drug_name': row.drug_name,
+            'stock_quantity': row.stock_quantity,
+            'unit_price': row.unit_price or 0,
+            'total_value': row.total_value
         })
 
     return {
-        'total_inventory_value': total_value,
-        'total_unique_drugs': len(drugs),
-        'total_units': sum(d.stock_quantity for d in drugs),
+        'total_inventory_value': sum(c['total_value'] for c in by_category.values()),
+        'total_unique_drugs': sum(c['count'] for c in by_category.values()),
+        'total_units': sum(c['total_quantity'] for c in by_category.values()),
         'by_category': by_category
     }
 
 
 def generate_patient_demographics_report():
     """Helper: patient demographics report"""
-    patients = Patient.query.all()
+    age_group = case(
+        (Patient.age < 18, 'Under 18'),
+        (Patient.age <= 30, '18-30'),
+        (Patient.age <= 45, '31-45'),
+        (Patient.age <= 60, '46-60'),
+        else_='Over 60'
+    )
+
+    age_rows = db.session.query(
+        age_group.label('age_group'),
+        func.count(Patient.id).label('count')
+    ).group_by(age_group).all()
 
     age_groups = {
         'Under 18': 0,
@@ -481,37 +636,38 @@ def generate_patient_demographics_report():
         '46-60': 0,
         'Over 60': 0
     }
-
-    conditions = {}
-    cities = {}
-
-    for patient in patients:
-        if patient.age < 18:
-            age_groups['Under 18'] += 1
-        elif patient.age <= 30:
-            age_groups['18-30'] += 1
-        elif patient.age <= 45:
-            age_groups['31-45'] += 1
-        elif patient.age <= 60:
-            age_groups['46-60'] += 1
-        else:
-            age_groups['Over 60'] += 1
-
-        if patient.primary_condition:
-            conditions[patient.primary_condition] = conditions.get(patient.primary_condition, 0) + 1
-
-        if patient.city:
-            cities[patient.city] = cities.get(patient.city, 0) + 1
+    for ag in age_rows:
+        age_groups[ag[0]] = ag[1]
+
+    conditions = db.session.query(
+        Patient.primary_condition,
+        func.count(Patient.id).label('patient_count')
+    ).filter(Patient.primary_condition.isnot(None), Patient.primary_condition != '') \
+     .group_by(Patient.primary_condition) \
+     .order_by(func.count(Patient.id).desc()) \
+     .limit(10).all()
+
+    cities = db.session.query(
+        Patient.city,
+        func.count(Patient.id).label('patient_count')
+    ).filter(Patient.city.isnot(None), Patient.city != '') \
+     .group_by(Patient.city) \
+     .order_by(func.count(Patient.id).desc()) \
+     .limit(10).all()
+
+    genders = dict(
+        db.session.query(Patient.gender, func.count(Patient.id)).group_by(Patient.gender).all()
+    )
 
     return {
-        'total_patients': len(patients),
+        'total_patients': sum(age_groups.values()),
         'age_distribution': age_groups,
-        'top_conditions': dict(sorted(conditions.items(), key=lambda x: x[1], reverse=True)[:10]),
-        'top_cities': dict(sorted(cities.items(), key=lambda x: x[1], reverse=True)[:10]),
+        'top_conditions': {c[0]: c[1] for c in conditions},
+        'top_cities': {c[0]: c[1] for c in cities},
         'gender_distribution': {
-            'Male': len([p for p in patients if p.gender == 'Male']),
-            'Female': len([p for p in patients if p.gender == 'Female']),
-            'Other': len([p for p in patients if p.gender == 'Other']),
-            'Unknown': len([p for p in patients if not p.gender])
+            'Male': genders.get('Male', 0),
+            'Female': genders.get('Female', 0),
+            'Other': genders.get('Other', 0),
+            'Unknown': genders.get(None, 0) + genders.get('', 0)
         }
     }
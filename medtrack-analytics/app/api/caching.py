@@ -0,0 +1,29 @@
+# app/api/caching.py
+import hashlib
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+
+def is_success(rv):
+    """Only cache successful responses"""
+    return rv[1] == 200
+
+
+def etagged(view):
+    """Tag successful responses with a content ETag and answer If-None-Match with 304"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if response.status_code != 200:
+            return response
+
+        etag = hashlib.blake2b(response.get_data(), digest_size=16).hexdigest()
+        # Flask-Compress sends the ETag as "<etag>:<algorithm>", so compare the base tag
+        client_tags = request.if_none_match
+        if client_tags.star_tag or any(tag.split(':')[0] == etag for tag in client_tags.as_set()):
+            response = current_app.response_class(status=304)
+
+        response.set_etag(etag)
+        return response
+    return wrapper
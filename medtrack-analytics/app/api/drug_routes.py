@@ -1,18 +1,101 @@
 import logging
-from datetime import date, datetime, timedelta
-
-from flask import Blueprint, jsonify, request
-from sqlalchemy import or_
-
-from app import db
+import uuid
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import groupby
+
+from flask import Blueprint, abort, jsonify, request
+from sqlalchemy import Float, Integer, bindparam, cast, column, event, func, or_, select, true, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
+
+from app import cache, db
+from app.api.caching import etagged, is_success
 from app.models.drug import Drug
 from app.models.inventory_transaction import InventoryTransaction
+from app.models.validation import checked_value, checked_values
+from app.session import RoutingSession
 
 drug_bp = Blueprint('drugs', __name__)
 logger = logging.getLogger(__name__)
 
 
+DRUG_CACHE_GENERATION_KEY = 'drugs_generation'
+
+DRUG_REQUIRED_FIELDS = ['drug_code', 'drug_name', 'manufacturer', 'unit_price']
+
+UPDATEABLE_FIELDS = [
+    'drug_name', 'generic_name', 'manufacturer', 'drug_class',
+    'category', 'unit_price', 'cost_price', 'stock_quantity',
+    'min_stock_level', 'max_stock_level', 'expiry_date',
+    'storage_conditions'
+]
+
+
+@event.listens_for(Drug, 'after_insert')
+@event.listens_for(Drug, 'after_update')
+@event.listens_for(Drug, 'after_delete')
+def _invalidate_drug_cache(mapper=None, connection=None, target=None):
+    """Start a new cache generation so cached drug responses are no longer used"""
+    cache.set(DRUG_CACHE_GENERATION_KEY, uuid.uuid4().hex, timeout=0)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _invalidate_drug_cache_on_bulk_write(orm_execute_state):
+    """Bulk INSERT/UPDATE/DELETE statements skip mapper events, so invalidate here too"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is Drug:
+        _invalidate_drug_cache()
+
+
+def _drug_cache_key(*args, **kwargs):
+    """Cache key from the full URL and the current drug cache generation"""
+    return f"drugs:{cache.get(DRUG_CACHE_GENERATION_KEY)}:{request.full_path}"
+
+
+# Drug list statements, built once per combination of active filters
+_drug_list_statements = {}
+
+_drug_search_statement = select(*Drug.__table__.c).where(
+    or_(
+        Drug.drug_name.ilike(bindparam('pattern')),
+        Drug.generic_name.ilike(bindparam('pattern')),
+        Drug.drug_code.ilike(bindparam('pattern')),
+        Drug.manufacturer.ilike(bindparam('pattern'))
+    )
+).limit(bindparam('limit'))
+
+
+def _drug_list_statement(filters, low_stock):
+    """Select for the given filter names, reusing the statement across requests"""
+    key = (filters, low_stock)
+    stmt = _drug_list_statements.get(key)
+    if stmt is None:
+        stmt = select(*Drug.__table__.c)
+        if 'category' in filters:
+            stmt = stmt.where(Drug.category == bindparam('category'))
+        if 'manufacturer' in filters:
+            stmt = stmt.where(Drug.manufacturer.ilike(bindparam('manufacturer')))
+        if 'min_price' in filters:
+            stmt = stmt.where(Drug.unit_price >= bindparam('min_price'))
+        if 'max_price' in filters:
+            stmt = stmt.where(Drug.unit_price <= bindparam('max_price'))
+        if low_stock:
+            stmt = stmt.where(Drug.low_stock_filter())
+        if 'expiry_threshold' in filters:
+            stmt = stmt.where(
+                Drug.expiry_date <= bindparam('expiry_threshold'),
+                Drug.expiry_date >= bindparam('today')
+            )
+        stmt = _drug_list_statements[key] = stmt.order_by(Drug.drug_name)
+    return stmt
+
+
 @drug_bp.route('/drugs', methods=['GET'])
+@etagged
+@cache.cached(timeout=60, make_cache_key=_drug_cache_key, response_filter=is_success)
 def get_drugs():
     """Get all drugs with optional filtering"""
     try:
@@ -23,31 +106,27 @@ def get_drugs():
         min_price = request.args.get('min_price')
         max_price = request.args.get('max_price')
 
-        query = Drug.query
+        params = {}
 
         if category:
-            query = query.filter(Drug.category == category)
+            params['category'] = category
         if manufacturer:
-            query = query.filter(Drug.manufacturer.ilike(f'%{manufacturer}%'))
+            params['manufacturer'] = f'%{manufacturer}%'
         if min_price:
-            query = query.filter(Drug.unit_price >= float(min_price))
+            params['min_price'] = float(min_price)
         if max_price:
-            query = query.filter(Drug.unit_price <= float(max_price))
-        if low_stock:
-            query = query.filter(Drug.stock_quantity <= Drug.min_stock_level * 1.5)
+            params['max_price'] = float(max_price)
         if expiring_soon:
-            expiry_threshold = date.today() + timedelta(days=30)
-            query = query.filter(
-                Drug.expiry_date <= expiry_threshold,
-                Drug.expiry_date >= date.today()
-            )
+            params['today'] = date.today()
+            params['expiry_threshold'] = params['today'] + timedelta(days=30)
 
-        drugs = query.order_by(Drug.drug_name).all()
+        stmt = _drug_list_statement(tuple(sorted(params)), low_stock)
+        drugs = db.session.execute(stmt, params).all()
 
         return jsonify({
             'success': True,
             'count': len(drugs),
-            'drugs': [drug.to_dict() for drug in drugs]
+            'drugs': [Drug.row_to_dict(drug) for drug in drugs]
         }), 200
 
     except Exception as e:
@@ -59,11 +138,23 @@ def get_drugs():
 def get_drug(drug_id):
     """Get single drug by ID"""
     try:
-        drug = Drug.query.get_or_404(drug_id)
-        transactions = InventoryTransaction.get_transactions_by_drug(drug_id, limit=10)
-
-        response = drug.to_dict()
-        response['recent_transactions'] = [t.to_dict() for t in transactions]
+        # One round-trip: the drug joined to its ten newest transactions
+        recent = select(InventoryTransaction).where(
+            InventoryTransaction.drug_id == Drug.id
+        ).order_by(InventoryTransaction.transaction_date.desc()).limit(10).lateral()
+        recent_transaction = aliased(InventoryTransaction, recent)
+
+        rows = db.session.execute(
+            select(Drug, recent_transaction)
+            .outerjoin(recent, true())
+            .where(Drug.id == drug_id)
+            .order_by(recent_transaction.transaction_date.desc())
+        ).all()
+        if not rows:
+            abort(404)
+
+        response = rows[0][0].to_dict()
+        response['recent_transactions'] = [t.to_dict() for _, t in rows if t is not None]
 
         return jsonify({'success': True, 'drug': response}), 200
 
@@ -72,14 +163,32 @@ def get_drug(drug_id):
         return jsonify({'success': False, 'error': str(e)}), 404 if '404' in str(e) else 500
 
 
+def _new_drug_values(data):
+    """Column values for a drug created from request data"""
+    return {
+        'drug_code': data['drug_code'],
+        'drug_name': data['drug_name'],
+        'generic_name': data.get('generic_name'),
+        'manufacturer': data['manufacturer'],
+        'drug_class': data.get('drug_class'),
+        'category': data.get('category', 'Prescription'),
+        'unit_price': float(data['unit_price']),
+        'cost_price': float(data.get('cost_price', float(data['unit_price']) * 0.7)),
+        'stock_quantity': int(data.get('stock_quantity', 0)),
+        'min_stock_level': int(data.get('min_stock_level', 10)),
+        'max_stock_level': int(data.get('max_stock_level', 1000)),
+        'expiry_date': date.fromisoformat(data['expiry_date']) if data.get('expiry_date') else None,
+        'storage_conditions': data.get('storage_conditions')
+    }
+
+
 @drug_bp.route('/drugs', methods=['POST'])
 def create_drug():
     """Create a new drug"""
     try:
         data = request.get_json()
 
-        required_fields = ['drug_code', 'drug_name', 'manufacturer', 'unit_price']
-        for field in required_fields:
+        for field in DRUG_REQUIRED_FIELDS:
             if field not in data:
                 return jsonify({'success': False, 'error': f'Missing required field: {field}'}), 400
 
@@ -87,21 +196,7 @@ def create_drug():
         if existing_drug:
             return jsonify({'success': False, 'error': f'Drug with code {data["drug_code"]} already exists'}), 409
 
-        drug = Drug(
-            drug_code=data['drug_code'],
-            drug_name=data['drug_name'],
-            generic_name=data.get('generic_name'),
-            manufacturer=data['manufacturer'],
-            drug_class=data.get('drug_class'),
-            category=data.get('category', 'Prescription'),
-            unit_price=float(data['unit_price']),
-            cost_price=float(data.get('cost_price', float(data['unit_price']) * 0.7)),
-            stock_quantity=int(data.get('stock_quantity', 0)),
-            min_stock_level=int(data.get('min_stock_level', 10)),
-            max_stock_level=int(data.get('max_stock_level', 1000)),
-            expiry_date=datetime.strptime(data['expiry_date'], '%Y-%m-%d').date() if data.get('expiry_date') else None,
-            storage_conditions=data.get('storage_conditions')
-        )
+        drug = Drug(**_new_drug_values(data))
 
         db.session.add(drug)
         db.session.commit()
@@ -117,6 +212,60 @@ def create_drug():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@drug_bp.route('/drugs/bulk', methods=['POST'])
+def bulk_create_drugs():
+    """Create many drugs with a single multi-row INSERT"""
+    try:
+        data = request.get_json() or {}
+        entries = data.get('drugs', [])
+        if not entries:
+            return jsonify({'success': False, 'error': 'No drugs provided'}), 400
+
+        rows = []
+        for index, entry in enumerate(entries):
+            for field in DRUG_REQUIRED_FIELDS:
+                if field not in entry:
+                    return jsonify({'success': False, 'error': f'Missing required field: {field} (drug {index})'}), 400
+
+            rows.append(checked_values(Drug, _new_drug_values(entry)))
+
+        codes = [row['drug_code'] for row in rows]
+        if len(set(codes)) != len(codes):
+            return jsonify({'success': False, 'error': 'Duplicate drug codes in request'}), 400
+
+        # The unique index rejects existing codes inside the INSERT itself; if any
+        # row was skipped the whole batch is rolled back, as before
+        created = dict(
+            db.session.execute(
+                insert(Drug).on_conflict_do_nothing(index_elements=[Drug.drug_code])
+                .returning(Drug.drug_code, Drug.id),
+                rows
+            ).all()
+        )
+        existing_codes = [code for code in codes if code not in created]
+        if existing_codes:
+            db.session.rollback()
+            return jsonify({'success': False, 'error': f'Drugs with codes {", ".join(existing_codes)} already exist'}), 409
+
+        created_ids = [created[code] for code in codes]
+        db.session.commit()
+        logger.info(f"Bulk created {len(created_ids)} drugs")
+
+        return jsonify({
+            'success': True,
+            'message': f'Successfully created {len(created_ids)} drugs',
+            'created_ids': created_ids
+        }), 201
+
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': f'Validation error: {str(e)}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error in bulk drug create: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @drug_bp.route('/drugs/<int:drug_id>', methods=['PUT'])
 def update_drug(drug_id):
     """Update an existing drug"""
@@ -124,17 +273,10 @@ def update_drug(drug_id):
         drug = Drug.query.get_or_404(drug_id)
         data = request.get_json()
 
-        updateable_fields = [
-            'drug_name', 'generic_name', 'manufacturer', 'drug_class',
-            'category', 'unit_price', 'cost_price', 'stock_quantity',
-            'min_stock_level', 'max_stock_level', 'expiry_date',
-            'storage_conditions'
-        ]
-
-        for field in updateable_fields:
+        for field in UPDATEABLE_FIELDS:
             if field in data:
                 if field == 'expiry_date' and data[field]:
-                    setattr(drug, field, datetime.strptime(data[field], '%Y-%m-%d').date())
+                    setattr(drug, field, date.fromisoformat(data[field]))
                 else:
                     setattr(drug, field, data[field])
 
@@ -202,14 +344,16 @@ def update_stock(drug_id):
 
 
 @drug_bp.route('/drugs/low-stock', methods=['GET'])
+@etagged
+@cache.cached(timeout=60, make_cache_key=_drug_cache_key, response_filter=is_success)
 def get_low_stock():
     """Get all drugs that are low in stock"""
     try:
         threshold_multiplier = float(request.args.get('threshold', 1.5))
         low_stock_drugs = Drug.get_low_stock_items(threshold_multiplier)
 
-        critical_count = len([d for d in low_stock_drugs if d.needs_restock(1.0)])
-        low_count = len([d for d in low_stock_drugs if not d.needs_restock(1.0)])
+        critical_count = sum(1 for d in low_stock_drugs if d.stock_quantity <= d.min_stock_level)
+        low_count = len(low_stock_drugs) - critical_count
 
         return jsonify({
             'success': True,
@@ -219,7 +363,7 @@ def get_low_stock():
                 'low_count': low_count,
                 'threshold_multiplier': threshold_multiplier
             },
-            'drugs': [drug.to_dict() for drug in low_stock_drugs]
+            'drugs': [Drug.row_to_dict(drug) for drug in low_stock_drugs]
         }), 200
 
     except Exception as e:
@@ -234,21 +378,22 @@ def get_expiring_soon():
         days_threshold = int(request.args.get('days', 30))
         expiring_drugs = Drug.get_expiring_soon(days_threshold)
 
-        from collections import defaultdict
-        by_month = defaultdict(list)
-        for drug in expiring_drugs:
-            if drug.expiry_date:
-                month_key = drug.expiry_date.strftime('%Y-%m')
-                by_month[month_key].append(drug.to_dict())
+        drugs = [Drug.row_to_dict(drug) for drug in expiring_drugs]
+
+        # Rows arrive ordered by expiry_date, so each month is one contiguous run
+        by_month = {
+            month_key: list(month_drugs)
+            for month_key, month_drugs in groupby(drugs, key=lambda drug: drug['expiry_date'][:7])
+        }
 
         return jsonify({
             'success': True,
             'summary': {
                 'total_expiring': len(expiring_drugs),
                 'days_threshold': days_threshold,
-                'by_month': dict(by_month)
+                'by_month': by_month
             },
-            'drugs': [drug.to_dict() for drug in expiring_drugs]
+            'drugs': drugs
         }), 200
 
     except Exception as e:
@@ -257,19 +402,25 @@ def get_expiring_soon():
 
 
 @drug_bp.route('/drugs/inventory/value', methods=['GET'])
+@etagged
+@cache.cached(timeout=60, make_cache_key=_drug_cache_key, response_filter=is_success)
 def get_inventory_value():
     """Calculate total inventory value"""
     try:
-        drugs = Drug.query.filter(Drug.stock_quantity > 0).all()
-
-        total_value = sum(drug.get_stock_value() for drug in drugs)
-        total_items = sum(drug.stock_quantity for drug in drugs)
-        unique_drugs = len(drugs)
-
-        value_by_category = {}
-        for drug in drugs:
-            category = drug.category or 'Uncategorized'
-            value_by_category[category] = value_by_category.get(category, 0) + drug.get_stock_value()
+        category = func.coalesce(Drug.category, 'Uncategorized')
+        by_category = db.session.execute(
+            select(
+                category,
+                cast(func.sum(Drug.stock_value), Float).label('value'),
+                func.sum(Drug.stock_quantity).label('items'),
+                func.count(Drug.id).label('drugs')
+            ).where(Drug.stock_quantity > 0).group_by(category)
+        ).all()
+
+        value_by_category = {row[0]: row.value or 0.0 for row in by_category}
+        total_value = sum(value_by_category.values())
+        total_items = sum(row.items for row in by_category)
+        unique_drugs = sum(row.drugs for row in by_category)
 
         return jsonify({
             'success': True,
@@ -294,28 +445,54 @@ def batch_update_drugs():
         data = request.get_json()
         updates = data.get('updates', [])
 
-        updated_drugs = []
-        for update in updates:
-            drug_id = update.get('drug_id')
-            field = update.get('field')
-            value = update.get('value')
+        # Last value wins per (field, drug), as with applying updates in order
+        values_by_field = defaultdict(dict)
+        requested = []
+        ignored_fields = set()
+        for entry in updates:
+            drug_id = entry.get('drug_id')
+            field = entry.get('field')
+            value = entry.get('value')
 
             if not all([drug_id, field, value]):
                 continue
+            # Only the fields PUT /drugs/<id> accepts; keys, computed and audit columns are not set
+            if field not in UPDATEABLE_FIELDS:
+                ignored_fields.add(field)
+                continue
 
-            drug = Drug.query.get(drug_id)
-            if drug and hasattr(drug, field):
-                setattr(drug, field, value)
-                updated_drugs.append(drug.id)
+            values_by_field[field][drug_id] = checked_value(Drug, field, value)
+            requested.append((drug_id, field))
+
+        # One UPDATE ... FROM (VALUES ...) per field instead of a load and flush per drug
+        updated = set()
+        for field, values_by_id in values_by_field.items():
+            target = Drug.__table__.c[field]
+            rows = values(
+                column('id', Integer), column('value', target.type), name='batch'
+            ).data(list(values_by_id.items()))
+            updated.update(
+                (drug_id, field) for drug_id in db.session.execute(
+                    update(Drug)
+                    .where(Drug.id == rows.c.id)
+                    .values({field: cast(rows.c.value, target.type)})
+                    .returning(Drug.id)
+                ).scalars()
+            )
 
         db.session.commit()
+        updated_drugs = [drug_id for drug_id, field in requested if (drug_id, field) in updated]
 
         return jsonify({
             'success': True,
             'message': f'Successfully updated {len(updated_drugs)} drugs',
-            'updated_ids': updated_drugs
+            'updated_ids': updated_drugs,
+            'ignored_fields': sorted(ignored_fields)
         }), 200
 
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': f'Validation error: {str(e)}'}), 400
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error in batch update: {str(e)}")
@@ -332,20 +509,15 @@ def search_drugs():
         if not query or len(query) < 2:
             return jsonify({'success': True, 'message': 'Search query too short', 'drugs': []}), 200
 
-        results = Drug.query.filter(
-            or_(
-                Drug.drug_name.ilike(f'%{query}%'),
-                Drug.generic_name.ilike(f'%{query}%'),
-                Drug.drug_code.ilike(f'%{query}%'),
-                Drug.manufacturer.ilike(f'%{query}%')
-            )
-        ).limit(limit).all()
+        results = db.session.execute(
+            _drug_search_statement, {'pattern': f'%{query}%', 'limit': limit}
+        ).all()
 
         return jsonify({
             'success': True,
             'query': query,
             'count': len(results),
-            'drugs': [drug.to_dict() for drug in results]
+            'drugs': [Drug.row_to_dict(drug) for drug in results]
         }), 200
 
     except Exception as e:
@@ -1,21 +1,112 @@
+import base64
+import binascii
+import json
 import logging
-import uuid
-from datetime import datetime
+from datetime import date
 
 from flask import Blueprint, jsonify, request
-from sqlalchemy import or_
+from sqlalchemy import bindparam, exists, func, insert, or_, select, tuple_
 
 from app import db
 from app.models.patient import Patient
 from app.models.prescription import Prescription
+from app.models.validation import checked_values
 
 patient_bp = Blueprint('patients', __name__)
 logger = logging.getLogger(__name__)
 
 
+PATIENT_REQUIRED_FIELDS = ['first_name', 'last_name', 'date_of_birth']
+
+# Keyset-paginated patient list statements, built once per combination of active filters
+_patient_list_statements = {}
+
+_patient_search_statement = select(*Patient.__table__.c).where(
+    or_(
+        Patient.first_name.ilike(bindparam('pattern')),
+        Patient.last_name.ilike(bindparam('pattern')),
+        Patient.patient_code.ilike(bindparam('pattern')),
+        Patient.primary_condition.ilike(bindparam('pattern')),
+        Patient.city.ilike(bindparam('pattern'))
+    )
+).limit(bindparam('limit'))
+
+
+def _patient_list_statement(filters):
+    """Select for the given filter names, reusing the statement across requests"""
+    stmt = _patient_list_statements.get(filters)
+    if stmt is None:
+        stmt = select(*Patient.__table__.c)
+        if 'min_age' in filters:
+            stmt = stmt.where(Patient.age >= bindparam('min_age'))
+        if 'max_age' in filters:
+            stmt = stmt.where(Patient.age <= bindparam('max_age'))
+        if 'gender' in filters:
+            stmt = stmt.where(Patient.gender == bindparam('gender'))
+        if 'condition' in filters:
+            stmt = stmt.where(Patient.primary_condition.ilike(bindparam('condition')))
+        if 'city' in filters:
+            stmt = stmt.where(Patient.city.ilike(bindparam('city')))
+        if 'state' in filters:
+            stmt = stmt.where(Patient.state.ilike(bindparam('state')))
+        if 'cursor_id' in filters:
+            stmt = stmt.where(
+                tuple_(Patient.last_name, Patient.first_name, Patient.id) > tuple_(
+                    bindparam('cursor_last_name'), bindparam('cursor_first_name'), bindparam('cursor_id')
+                )
+            )
+        stmt = _patient_list_statements[filters] = stmt.order_by(
+            Patient.last_name, Patient.first_name, Patient.id
+        ).limit(bindparam('limit'))
+    return stmt
+
+
+def _encode_cursor(row):
+    """Opaque keyset cursor pointing just past the given patient row"""
+    key = json.dumps([row.last_name, row.first_name, row.id])
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    """Decode a cursor into its (last_name, first_name, id) key"""
+    try:
+        last_name, first_name, patient_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (TypeError, binascii.Error, UnicodeError, json.JSONDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    return str(last_name), str(first_name), int(patient_id)
+
+
+def _new_patient_values(data):
+    """Column values for a patient created from request data"""
+    return {
+        'first_name': data['first_name'],
+        'last_name': data['last_name'],
+        'date_of_birth': date.fromisoformat(data['date_of_birth']),
+        'gender': data.get('gender'),
+        'email': data.get('email'),
+        'phone': data.get('phone'),
+        'address': data.get('address'),
+        'city': data.get('city'),
+        'state': data.get('state'),
+        'zip_code': data.get('zip_code'),
+        'primary_condition': data.get('primary_condition'),
+        'insurance_id': data.get('insurance_id')
+    }
+
+
+def _patient_exists(patient_id):
+    """Check a patient id without loading the patient row"""
+    return db.session.execute(select(exists().where(Patient.id == patient_id))).scalar()
+
+
 @patient_bp.route('/patients', methods=['GET'])
 def get_patients():
-    """Get patients with optional filtering"""
+    """Get patients with optional filtering
+
+    Pages by cursor (has_more/next_cursor) unless a page number is given, in
+    which case the offset response with page, total_pages and total_patients
+    is returned.
+    """
     try:
         min_age = request.args.get('min_age')
         max_age = request.args.get('max_age')
@@ -24,34 +115,61 @@ def get_patients():
         city = request.args.get('city')
         state = request.args.get('state')
 
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 20))
+        cursor = request.args.get('cursor')
+        per_page = min(max(int(request.args.get('per_page', 20)), 1), 100)
 
-        query = Patient.query
+        params = {}
 
         if min_age:
-            query = query.filter(Patient.age >= int(min_age))
+            params['min_age'] = int(min_age)
         if max_age:
-            query = query.filter(Patient.age <= int(max_age))
+            params['max_age'] = int(max_age)
         if gender:
-            query = query.filter(Patient.gender == gender)
+            params['gender'] = gender
         if condition:
-            query = query.filter(Patient.primary_condition.ilike(f'%{condition}%'))
+            params['condition'] = f'%{condition}%'
         if city:
-            query = query.filter(Patient.city.ilike(f'%{city}%'))
+            params['city'] = f'%{city}%'
         if state:
-            query = query.filter(Patient.state.ilike(f'%{state}%'))
+            params['state'] = f'%{state}%'
+
+        # Offset pagination stays available for clients that still page by number
+        if 'page' in request.args:
+            page = int(request.args.get('page', 1))
+            paginated_patients = db.paginate(
+                _patient_list_statement(tuple(sorted(params))).with_only_columns(Patient).limit(None).params(params),
+                page=page, per_page=per_page, error_out=False
+            )
 
-        paginated_patients = query.order_by(Patient.last_name, Patient.first_name) \
-            .paginate(page=page, per_page=per_page, error_out=False)
+            return jsonify({
+                'success': True,
+                'page': paginated_patients.page,
+                'per_page': paginated_patients.per_page,
+                'total_pages': paginated_patients.pages,
+                'total_patients': paginated_patients.total,
+                'patients': [patient.to_dict() for patient in paginated_patients.items]
+            }), 200
+
+        if cursor:
+            try:
+                params['cursor_last_name'], params['cursor_first_name'], params['cursor_id'] = _decode_cursor(cursor)
+            except ValueError:
+                return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+
+        stmt = _patient_list_statement(tuple(sorted(params)))
+        params['limit'] = per_page + 1
+        rows = db.session.execute(stmt, params).all()
+
+        # One extra row tells whether another page follows
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
 
         return jsonify({
             'success': True,
-            'page': paginated_patients.page,
-            'per_page': paginated_patients.per_page,
-            'total_pages': paginated_patients.pages,
-            'total_patients': paginated_patients.total,
-            'patients': [patient.to_dict() for patient in paginated_patients.items]
+            'per_page': per_page,
+            'has_more': has_more,
+            'next_cursor': _encode_cursor(rows[-1]) if has_more else None,
+            'patients': [Patient.row_to_dict(patient) for patient in rows]
         }), 200
 
     except Exception as e:
@@ -63,16 +181,29 @@ def get_patients():
 def get_patient(patient_id):
     """Get single patient with prescriptions"""
     try:
-        patient = Patient.query.get_or_404(patient_id)
-
-        prescriptions = Prescription.query.filter_by(patient_id=patient_id) \
-            .order_by(Prescription.date_prescribed.desc()) \
-            .limit(20).all()
+        active_count = select(func.count(Prescription.id)).where(
+            Prescription.patient_id == Patient.id,
+            Prescription.status == 'Active'
+        ).scalar_subquery()
+
+        row = db.session.execute(
+            select(Patient, active_count).where(Patient.id == patient_id)
+        ).first()
+        if row is None:
+            return jsonify({'success': False, 'error': f'Patient with ID {patient_id} not found'}), 404
+        patient, active_prescriptions = row
+
+        prescriptions = db.session.scalars(
+            select(Prescription)
+            .where(Prescription.patient_id == patient_id)
+            .order_by(Prescription.date_prescribed.desc())
+            .limit(20)
+        ).all()
 
         response = patient.to_dict()
-        response['prescriptions'] = [p.to_dict() for p in prescriptions]
+        response['prescriptions'] = Prescription.serialize_many(prescriptions)
         response['prescription_count'] = len(prescriptions)
-        response['active_prescriptions'] = Prescription.query.filter_by(patient_id=patient_id, status='Active').count()
+        response['active_prescriptions'] = active_prescriptions
 
         return jsonify({'success': True, 'patient': response}), 200
 
@@ -87,32 +218,15 @@ def create_patient():
     try:
         data = request.get_json()
 
-        required_fields = ['first_name', 'last_name', 'date_of_birth']
-        for field in required_fields:
+        for field in PATIENT_REQUIRED_FIELDS:
             if field not in data:
                 return jsonify({'success': False, 'error': f'Missing required field: {field}'}), 400
 
-        patient_code = f"PAT-{str(uuid.uuid4())[:8].upper()}"
-
-        patient = Patient(
-            patient_code=patient_code,
-            first_name=data['first_name'],
-            last_name=data['last_name'],
-            date_of_birth=datetime.strptime(data['date_of_birth'], '%Y-%m-%d').date(),
-            gender=data.get('gender'),
-            email=data.get('email'),
-            phone=data.get('phone'),
-            address=data.get('address'),
-            city=data.get('city'),
-            state=data.get('state'),
-            zip_code=data.get('zip_code'),
-            primary_condition=data.get('primary_condition'),
-            insurance_id=data.get('insurance_id')
-        )
+        patient = Patient(patient_code=Patient.next_patient_code(), **_new_patient_values(data))
 
         db.session.add(patient)
         db.session.commit()
-        logger.info(f"Created new patient: {patient_code}")
+        logger.info(f"Created new patient: {patient.patient_code}")
 
         return jsonify({'success': True, 'message': 'Patient created successfully', 'patient': patient.to_dict()}), 201
 
@@ -124,6 +238,48 @@ def create_patient():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@patient_bp.route('/patients/bulk', methods=['POST'])
+def bulk_create_patients():
+    """Create many patients with a single multi-row INSERT"""
+    try:
+        data = request.get_json() or {}
+        entries = data.get('patients', [])
+        if not entries:
+            return jsonify({'success': False, 'error': 'No patients provided'}), 400
+
+        rows = []
+        for index, entry in enumerate(entries):
+            for field in PATIENT_REQUIRED_FIELDS:
+                if field not in entry:
+                    return jsonify({'success': False, 'error': f'Missing required field: {field} (patient {index})'}), 400
+
+            rows.append(checked_values(Patient, _new_patient_values(entry)))
+
+        for row, patient_code in zip(rows, Patient.reserve_patient_codes(db.session, len(rows))):
+            row['patient_code'] = patient_code
+
+        created_ids = db.session.scalars(
+            insert(Patient).returning(Patient.id, sort_by_parameter_order=True), rows
+        ).all()
+        db.session.commit()
+        logger.info(f"Bulk created {len(created_ids)} patients")
+
+        return jsonify({
+            'success': True,
+            'message': f'Successfully created {len(created_ids)} patients',
+            'created_ids': created_ids,
+            'patient_codes': [row['patient_code'] for row in rows]
+        }), 201
+
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': f'Validation error: {str(e)}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error in bulk patient create: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @patient_bp.route('/patients/<int:patient_id>', methods=['PUT'])
 def update_patient(patient_id):
     """Update patient information"""
@@ -140,7 +296,7 @@ def update_patient(patient_id):
         for field in updateable_fields:
             if field in data:
                 if field == 'date_of_birth' and data[field]:
-                    setattr(patient, field, datetime.strptime(data[field], '%Y-%m-%d').date())
+                    setattr(patient, field, date.fromisoformat(data[field]))
                 else:
                     setattr(patient, field, data[field])
 
@@ -159,19 +315,23 @@ def update_patient(patient_id):
 def get_patient_prescriptions(patient_id):
     """Get all prescriptions for a patient"""
     try:
-        Patient.query.get_or_404(patient_id)
+        if not _patient_exists(patient_id):
+            return jsonify({'success': False, 'error': f'Patient with ID {patient_id} not found'}), 404
         status = request.args.get('status')
+        exclude_expired = request.args.get('exclude_expired', 'false').lower() == 'true'
 
         query = Prescription.query.filter_by(patient_id=patient_id)
         if status:
             query = query.filter_by(status=status)
+        if exclude_expired:
+            query = query.filter(Prescription.not_expired())
 
         prescriptions = query.order_by(Prescription.date_prescribed.desc()).all()
 
         return jsonify({
             'success': True,
             'patient_id': patient_id,
-            'prescriptions': [p.to_dict() for p in prescriptions],
+            'prescriptions': Prescription.serialize_many(prescriptions),
             'count': len(prescriptions)
         }), 200
 
@@ -184,7 +344,8 @@ def get_patient_prescriptions(patient_id):
 def create_prescription(patient_id):
     """Create a new prescription for a patient"""
     try:
-        Patient.query.get_or_404(patient_id)
+        if not _patient_exists(patient_id):
+            return jsonify({'success': False, 'error': f'Patient with ID {patient_id} not found'}), 404
         data = request.get_json()
 
         required_fields = ['drug_id', 'doctor_name', 'dosage', 'frequency', 'duration_days']
@@ -192,16 +353,14 @@ def create_prescription(patient_id):
             if field not in data:
                 return jsonify({'success': False, 'error': f'Missing required field: {field}'}), 400
 
-        prescription_code = f"RX-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:6].upper()}"
-
         prescription = Prescription(
-            prescription_code=prescription_code,
+            prescription_code=Prescription.next_prescription_code(),
             patient_id=patient_id,
             drug_id=int(data['drug_id']),
             doctor_name=data['doctor_name'],
             doctor_license=data.get('doctor_license'),
             hospital_clinic=data.get('hospital_clinic'),
-            date_prescribed=datetime.strptime(data.get('date_prescribed', datetime.now().date().isoformat()), '%Y-%m-%d').date(),
+            date_prescribed=date.fromisoformat(data['date_prescribed']) if 'date_prescribed' in data else date.today(),
             dosage=data['dosage'],
             frequency=data['frequency'],
             duration_days=int(data['duration_days']),
@@ -212,7 +371,7 @@ def create_prescription(patient_id):
 
         db.session.add(prescription)
         db.session.commit()
-        logger.info(f"Created prescription {prescription_code} for patient {patient_id}")
+        logger.info(f"Created prescription {prescription.prescription_code} for patient {patient_id}")
 
         return jsonify({'success': True, 'message': 'Prescription created successfully', 'prescription': prescription.to_dict()}), 201
 
@@ -232,21 +391,15 @@ def search_patients():
         if not query or len(query) < 2:
             return jsonify({'success': True, 'message': 'Search query too short', 'patients': []}), 200
 
-        results = Patient.query.filter(
-            or_(
-                Patient.first_name.ilike(f'%{query}%'),
-                Patient.last_name.ilike(f'%{query}%'),
-                Patient.patient_code.ilike(f'%{query}%'),
-                Patient.primary_condition.ilike(f'%{query}%'),
-                Patient.city.ilike(f'%{query}%')
-            )
-        ).limit(limit).all()
+        results = db.session.execute(
+            _patient_search_statement, {'pattern': f'%{query}%', 'limit': limit}
+        ).all()
 
         return jsonify({
             'success': True,
             'query': query,
             'count': len(results),
-            'patients': [patient.to_dict() for patient in results]
+            'patients': [Patient.row_to_dict(patient) for patient in results]
         }), 200
 
     except Exception as e:
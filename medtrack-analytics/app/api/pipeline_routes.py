@@ -1,11 +1,15 @@
-import glob
+import fnmatch
 import json
 import logging
 import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 
+from app import cache
 from app.pipeline.data_pipeline import PharmaDataPipeline
 from app.pipeline.data_quality import DataQualityMonitor
 
@@ -15,43 +19,120 @@ logger = logging.getLogger(__name__)
 pipeline = PharmaDataPipeline()
 quality_monitor = DataQualityMonitor()
 
+# How long the newest stats file name is reused before rescanning reports/
+STATS_FILE_CACHE_SECONDS = 5
+_stats_file_cache = {'file': None, 'checked_at': 0.0}
+
+# Pipeline runs execute off the request thread; a single worker keeps runs
+# serialized since the shared pipeline instance is not thread-safe
+_pipeline_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pipeline-run')
+
+# Task statuses live in the app cache rather than process memory, so with the
+# Redis backend (REDIS_URL) any API worker can answer a status poll and
+# statuses survive restarts. SimpleCache keeps them per process.
+PIPELINE_TASK_KEY = 'pipeline_task:{}'
+PIPELINE_TASK_TTL_SECONDS = 24 * 60 * 60
+
+
+def _latest_stats_file():
+    """Path of the newest reports/pipeline_stats_*.json, or None if there is none"""
+    now = time.monotonic()
+    cached = _stats_file_cache['file']
+    if now - _stats_file_cache['checked_at'] < STATS_FILE_CACHE_SECONDS and (
+        cached is None or os.path.exists(cached)
+    ):
+        return cached
+
+    latest_file, latest_mtime = None, None
+    if os.path.isdir('reports'):
+        # scandir returns the stat data with the listing, unlike glob + getmtime
+        with os.scandir('reports') as entries:
+            for entry in entries:
+                if fnmatch.fnmatch(entry.name, 'pipeline_stats_*.json') and entry.is_file():
+                    mtime = entry.stat().st_mtime
+                    if latest_mtime is None or mtime > latest_mtime:
+                        latest_file, latest_mtime = entry.path, mtime
+
+    _stats_file_cache.update(file=latest_file, checked_at=now)
+    return latest_file
+
+
+def _tail_lines(path, count, block_size=32768):
+    """Return the last count lines of a file, reading blocks backwards from the end"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        # Stop once the tail holds more than count line breaks; the partial
+        # first line then falls outside the returned slice
+        while position > 0 and data.count(b'\n') <= count:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            data = f.read(read_size) + data
+
+    return data.decode('utf-8', errors='replace').split('\n')[-count:]
+
+
+def _save_task_status(status):
+    """Store a pipeline task status where every API worker can read it"""
+    cache.set(PIPELINE_TASK_KEY.format(status['task_id']), status, timeout=PIPELINE_TASK_TTL_SECONDS)
+
+
+def _run_pipeline(data_type):
+    """Run the requested pipeline and return (success, message)"""
+    if data_type:
+        success = pipeline.run_etl_pipeline(data_type)
+        return success, f"{data_type.capitalize()} pipeline completed"
+
+    results = pipeline.run_daily_pipeline()
+    return all(status == 'Success' for status in results.values()), 'Daily pipeline completed'
+
+
+def _run_pipeline_task(app, task):
+    """Run a queued pipeline task, recording its progress in the task status"""
+    with app.app_context():
+        _save_task_status({**task, 'status': 'running'})
+        try:
+            success, message = _run_pipeline(task['data_type'])
+            if success:
+                _save_task_status({**task, 'status': 'completed', 'message': message})
+            else:
+                _save_task_status({**task, 'status': 'failed', 'message': 'Pipeline failed'})
+        except Exception as e:  # noqa: BLE001
+            logger.error(f"Pipeline task {task['task_id']} failed: {str(e)}")
+            _save_task_status({**task, 'status': 'failed', 'error': str(e)})
+        finally:
+            quality_monitor.invalidate_cached_metrics()
+
 
 @pipeline_bp.route('/pipeline/run', methods=['POST'])
 def run_pipeline():
-    """Run the data pipeline"""
+    """Queue a data pipeline run on the background worker"""
     try:
         payload = request.get_json(silent=True) or {}
         data_type = payload.get('data_type')
 
-        if data_type:
-            success = pipeline.run_etl_pipeline(data_type)
-            message = f"{data_type.capitalize()} pipeline completed"
-        else:
-            results = pipeline.run_daily_pipeline()
-            success = all(status == 'Success' for status in results.values())
-            message = 'Daily pipeline completed'
-
-        if success:
-            return (
-                jsonify(
-                    {
-                        'success': True,
-                        'message': message,
-                        'timestamp': datetime.now().isoformat(),
-                    }
-                ),
-                200,
-            )
+        task_id = uuid.uuid4().hex
+        task = {
+            'task_id': task_id,
+            'data_type': data_type,
+            'submitted_at': datetime.now().isoformat(),
+        }
+        # Recorded before submitting, so the worker's 'running' status cannot be overwritten
+        _save_task_status({**task, 'status': 'queued'})
+        _pipeline_executor.submit(_run_pipeline_task, current_app._get_current_object(), task)
 
         return (
             jsonify(
                 {
-                    'success': False,
-                    'message': 'Pipeline failed',
-                    'timestamp': datetime.now().isoformat(),
+                    'success': True,
+                    'message': 'Pipeline run queued',
+                    'task_id': task_id,
+                    'timestamp': task['submitted_at'],
                 }
             ),
-            500,
+            202,
         )
 
     except Exception as e:  # noqa: BLE001
@@ -68,6 +149,17 @@ def run_pipeline():
         )
 
 
+@pipeline_bp.route('/pipeline/run/<task_id>', methods=['GET'])
+def get_pipeline_run(task_id):
+    """Get the status of a queued pipeline run"""
+    task = cache.get(PIPELINE_TASK_KEY.format(task_id))
+
+    if task is None:
+        return jsonify({'success': False, 'error': 'Unknown pipeline task'}), 404
+
+    return jsonify({'success': True, 'task': task}), 200
+
+
 @pipeline_bp.route('/pipeline/status', methods=['GET'])
 def get_pipeline_status():
     """Get pipeline status and statistics"""
@@ -83,10 +175,8 @@ def get_pipeline_status():
             with open(stats_file, 'r') as f:
                 stats = json.load(f)
         else:
-            pattern = 'reports/pipeline_stats_*.json'
-            files = glob.glob(pattern)
-            if files:
-                latest_file = max(files, key=os.path.getmtime)
+            latest_file = _latest_stats_file()
+            if latest_file:
                 with open(latest_file, 'r') as f:
                     stats = json.load(f)
 
@@ -112,7 +202,9 @@ def get_pipeline_status():
 def check_data_quality():
     """Run data quality check"""
     try:
-        report = quality_monitor.run_comprehensive_quality_check()
+        report = quality_monitor.run_comprehensive_quality_check(
+            force_refresh=request.args.get('refresh', 'false').lower() == 'true'
+        )
 
         return (
             jsonify(
@@ -148,12 +240,11 @@ def generate_sample_data():
         num_records = data.get('records', 100)
 
         sample_df = pipeline.generate_sample_data(data_type, num_records)
+        now = datetime.now()
 
         os.makedirs('data/raw', exist_ok=True)
-        output_file = (
-            f"data/raw/{data_type}_sample_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        )
-        sample_df.to_csv(output_file, index=False)
+        output_file = f"data/raw/{data_type}_sample_{now:%Y%m%d_%H%M%S}.csv"
+        pipeline.write_csv(sample_df, output_file)
 
         return (
             jsonify(
@@ -162,7 +253,7 @@ def generate_sample_data():
                     'message': f'Generated {num_records} sample {data_type} records',
                     'file': output_file,
                     'records': len(sample_df),
-                    'timestamp': datetime.now().isoformat(),
+                    'timestamp': now.isoformat(),
                 }
             ),
             200,
@@ -180,8 +271,7 @@ def get_pipeline_logs():
         log_file = 'logs/data_pipeline.log'
 
         if os.path.exists(log_file):
-            with open(log_file, 'r') as f:
-                logs = f.read().split('\n')[-100:]
+            logs = _tail_lines(log_file, 100)
         else:
             logs = ['No logs available']
 
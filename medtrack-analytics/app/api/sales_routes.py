@@ -1,24 +1,102 @@
+import base64
+import binascii
+import json
 import logging
-import uuid
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, time, timedelta
 
 from flask import Blueprint, jsonify, request
-from sqlalchemy import func
+from sqlalchemy import DateTime, Float, Integer, bindparam, cast, func, insert, literal, select, tuple_, update
 
 from app import db
 from app.models.drug import Drug
+from app.models.inventory_transaction import InventoryTransaction
 from app.models.sale import Sale
+from app.models.sales_daily import current_sales_daily
+from app.models.validation import checked_values
+from app.session import mark_strict_loading
 
 sales_bp = Blueprint('sales', __name__)
 logger = logging.getLogger(__name__)
 
 
+@sales_bp.before_request
+def _strict_loading_for_analytics():
+    """Sales analytics work on aggregates, so lazy loads there are always a mistake"""
+    if request.path.startswith('/api/sales/analytics/'):
+        mark_strict_loading()
+
+
+# Keyset-paginated sale list statements, built once per combination of active filters
+_sale_list_statements = {}
+
+# Pipeline-loaded sales have no sale_datetime, so they sort at midnight of their day
+SALE_SORT_TIME = func.coalesce(Sale.sale_datetime, cast(Sale.sale_date, DateTime))
+SALE_LIST_ORDER = (Sale.sale_date.desc(), SALE_SORT_TIME.desc(), Sale.id.desc())
+
+# Single sale with its drug summary as one plain row, skipping ORM instance construction
+_sale_detail_statement = select(
+    *Sale.__table__.c, Drug.drug_name, Drug.manufacturer, Drug.category
+).outerjoin(Drug, Sale.drug_id == Drug.id).where(Sale.id == bindparam('sale_id'))
+
+
+def _sale_list_statement(filters):
+    """Select for the given filter names, reusing the statement across requests"""
+    stmt = _sale_list_statements.get(filters)
+    if stmt is None:
+        stmt = select(*Sale.__table__.c)
+        if 'start_date' in filters:
+            stmt = stmt.where(Sale.sale_date >= bindparam('start_date'))
+        if 'end_date' in filters:
+            stmt = stmt.where(Sale.sale_date <= bindparam('end_date'))
+        if 'drug_id' in filters:
+            stmt = stmt.where(Sale.drug_id == bindparam('drug_id'))
+        if 'pharmacy_id' in filters:
+            stmt = stmt.where(Sale.pharmacy_id == bindparam('pharmacy_id'))
+        if 'payment_method' in filters:
+            stmt = stmt.where(Sale.payment_method == bindparam('payment_method'))
+        if 'cursor_id' in filters:
+            stmt = stmt.where(
+                tuple_(Sale.sale_date, SALE_SORT_TIME, Sale.id) < tuple_(
+                    bindparam('cursor_date'), bindparam('cursor_datetime'), bindparam('cursor_id')
+                )
+            )
+        stmt = _sale_list_statements[filters] = stmt.order_by(*SALE_LIST_ORDER).limit(bindparam('limit'))
+    return stmt
+
+
+def _parse_iso_date(value):
+    """Parse a YYYY-MM-DD query or body value into a date"""
+    if not isinstance(value, str) or len(value) != 10 or value[4] != '-' or value[7] != '-':
+        raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD")
+    return date.fromisoformat(value)
+
+
+def _include_transactions():
+    """Whether the summary endpoints should list the individual sales (default: yes)"""
+    return request.args.get('include_transactions', 'true').lower() != 'false'
+
+
+def _encode_cursor(sale):
+    """Opaque keyset cursor pointing just past the given sale"""
+    sale_datetime = sale.sale_datetime or datetime.combine(sale.sale_date, time.min)
+    key = json.dumps([sale.sale_date.isoformat(), sale_datetime.isoformat(), sale.id])
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    """Decode a cursor into its (sale_date, sale_datetime, id) key"""
+    try:
+        sale_date, sale_datetime, sale_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return date.fromisoformat(sale_date), datetime.fromisoformat(sale_datetime), int(sale_id)
+    except (TypeError, binascii.Error, UnicodeError, json.JSONDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
 @sales_bp.route('/sales', methods=['GET'])
 def get_sales():
     """Get sales with filtering and pagination"""
     try:
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 20))
+        per_page = min(max(int(request.args.get('per_page', 20)), 1), 100)
 
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
@@ -26,31 +104,61 @@ def get_sales():
         pharmacy_id = request.args.get('pharmacy_id')
         payment_method = request.args.get('payment_method')
 
-        query = Sale.query
+        params = {}
 
         if start_date:
-            query = query.filter(Sale.sale_date >= datetime.strptime(start_date, '%Y-%m-%d').date())
+            params['start_date'] = _parse_iso_date(start_date)
         if end_date:
-            query = query.filter(Sale.sale_date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+            params['end_date'] = _parse_iso_date(end_date)
         if drug_id:
-            query = query.filter(Sale.drug_id == int(drug_id))
+            params['drug_id'] = int(drug_id)
         if pharmacy_id:
-            query = query.filter(Sale.pharmacy_id == int(pharmacy_id))
+            params['pharmacy_id'] = int(pharmacy_id)
         if payment_method:
-            query = query.filter(Sale.payment_method == payment_method)
+            params['payment_method'] = payment_method
 
-        paginated_sales = query.order_by(Sale.sale_date.desc(), Sale.sale_datetime.desc()) \
-            .paginate(page=page, per_page=per_page, error_out=False)
+        # Offset pagination stays available for clients that still page by number
+        if 'page' in request.args:
+            page = int(request.args.get('page', 1))
+            paginated_sales = db.paginate(
+                _sale_list_statement(tuple(sorted(params))).with_only_columns(Sale).limit(None).params(params),
+                page=page, per_page=per_page, error_out=False
+            )
+
+            return jsonify({
+                'success': True,
+                'page': paginated_sales.page,
+                'per_page': paginated_sales.per_page,
+                'total_pages': paginated_sales.pages,
+                'total_items': paginated_sales.total,
+                'sales': [sale.to_dict() for sale in paginated_sales.items]
+            }), 200
+
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                params['cursor_date'], params['cursor_datetime'], params['cursor_id'] = _decode_cursor(cursor)
+            except ValueError:
+                return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+
+        stmt = _sale_list_statement(tuple(sorted(params)))
+        params['limit'] = per_page + 1
+        sales = db.session.execute(stmt, params).all()
+
+        # One extra row tells whether another page follows
+        has_more = len(sales) > per_page
+        sales = sales[:per_page]
 
         return jsonify({
             'success': True,
-            'page': paginated_sales.page,
-            'per_page': paginated_sales.per_page,
-            'total_pages': paginated_sales.pages,
-            'total_items': paginated_sales.total,
-            'sales': [sale.to_dict() for sale in paginated_sales.items]
+            'per_page': per_page,
+            'has_more': has_more,
+            'next_cursor': _encode_cursor(sales[-1]) if has_more else None,
+            'sales': [Sale.row_to_dict(sale) for sale in sales]
         }), 200
 
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Validation error: {str(e)}'}), 400
     except Exception as e:
         logger.error(f"Error fetching sales: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -60,22 +168,23 @@ def get_sales():
 def get_sale(sale_id):
     """Get single sale by ID"""
     try:
-        sale = Sale.query.get_or_404(sale_id)
-        drug = Drug.query.get(sale.drug_id)
+        sale = db.session.execute(_sale_detail_statement, {'sale_id': sale_id}).first()
+        if sale is None:
+            return jsonify({'success': False, 'error': f'Sale with ID {sale_id} not found'}), 404
 
-        response = sale.to_dict()
-        if drug:
+        response = Sale.row_to_dict(sale)
+        if sale.drug_name is not None:
             response['drug_details'] = {
-                'drug_name': drug.drug_name,
-                'manufacturer': drug.manufacturer,
-                'category': drug.category
+                'drug_name': sale.drug_name,
+                'manufacturer': sale.manufacturer,
+                'category': sale.category
             }
 
         return jsonify({'success': True, 'sale': response}), 200
 
     except Exception as e:
         logger.error(f"Error fetching sale {sale_id}: {str(e)}")
-        return jsonify({'success': False, 'error': str(e)}), 404 if '404' in str(e) else 500
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @sales_bp.route('/sales', methods=['POST'])
@@ -89,18 +198,9 @@ def create_sale():
             if field not in data:
                 return jsonify({'success': False, 'error': f'Missing required field: {field}'}), 400
 
-        drug = Drug.query.get(int(data['drug_id']))
-        if not drug:
-            return jsonify({'success': False, 'error': f'Drug with ID {data["drug_id"]} not found'}), 404
-
-        if drug.stock_quantity < int(data['quantity']):
-            return jsonify({
-                'success': False,
-                'error': f'Insufficient stock. Available: {drug.stock_quantity}, Requested: {data["quantity"]}'
-            }), 400
-
-        transaction_id = f"SALE-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
+        now = datetime.now()
 
+        drug_id = int(data['drug_id'])
         quantity = int(data['quantity'])
         unit_price = float(data['unit_price'])
         discount = float(data.get('discount', 0))
@@ -110,31 +210,61 @@ def create_sale():
         tax_amount = (subtotal - discount) * tax_rate
         total_amount = (subtotal - discount) + tax_amount
 
-        sale = Sale(
-            transaction_id=transaction_id,
-            drug_id=int(data['drug_id']),
-            sale_date=datetime.strptime(data.get('sale_date', datetime.now().date().isoformat()), '%Y-%m-%d').date(),
-            quantity=quantity,
-            unit_price=unit_price,
-            discount=discount,
-            tax_amount=tax_amount,
-            total_amount=total_amount,
-            pharmacy_id=int(data['pharmacy_id']),
-            pharmacy_name=data.get('pharmacy_name', 'Unknown Pharmacy'),
-            salesperson_id=data.get('salesperson_id'),
-            payment_method=data.get('payment_method', 'Cash'),
-            insurance_provider=data.get('insurance_provider'),
-            prescription_id=data.get('prescription_id')
-        )
-
-        db.session.add(sale)
-
-        drug.update_stock(
-            quantity_change=-quantity,
-            transaction_type='Sale',
-            reference_id=transaction_id,
-            notes=f'Sale transaction {transaction_id}'
-        )
+        sale_values = {
+            'drug_id': drug_id,
+            'sale_date': _parse_iso_date(data['sale_date']) if 'sale_date' in data else now.date(),
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'discount': discount,
+            'tax_amount': tax_amount,
+            'total_amount': total_amount,
+            'pharmacy_id': int(data['pharmacy_id']),
+            'pharmacy_name': data.get('pharmacy_name', 'Unknown Pharmacy'),
+            'salesperson_id': data.get('salesperson_id'),
+            'payment_method': data.get('payment_method', 'Cash'),
+            'insurance_provider': data.get('insurance_provider'),
+            'prescription_id': data.get('prescription_id')
+        }
+        sale_values = checked_values(Sale, sale_values)
+
+        # The stock check is part of the UPDATE, so concurrent sales cannot oversell.
+        # Each write returns what the next one and the response need, so there is
+        # no flush of loaded objects and no refresh after the commit
+        drug = db.session.execute(
+            update(Drug)
+            .where(Drug.id == drug_id, Drug.stock_quantity >= quantity)
+            .values(stock_quantity=Drug.stock_quantity - quantity)
+            .returning(Drug.drug_name, Drug.stock_quantity)
+        ).first()
+        if drug is None:
+            available = db.session.scalar(select(Drug.stock_quantity).where(Drug.id == drug_id))
+            if available is None:
+                return jsonify({'success': False, 'error': f'Drug with ID {data["drug_id"]} not found'}), 404
+            return jsonify({
+                'success': False,
+                'error': f'Insufficient stock. Available: {available}, Requested: {data["quantity"]}'
+            }), 400
+        new_stock = drug.stock_quantity
+
+        # The stock movement is inserted from the new sale's RETURNING row in the
+        # same statement, since its reference is the database-generated transaction id
+        new_sale = insert(Sale.__table__).values(sale_values).returning(*Sale.__table__.c).cte('new_sale')
+        movement = insert(InventoryTransaction.__table__).from_select(
+            ['drug_id', 'transaction_date', 'transaction_type', 'quantity_change',
+             'previous_quantity', 'new_quantity', 'reference_id', 'notes'],
+            select(
+                new_sale.c.drug_id,
+                literal(datetime.utcnow()),
+                literal('Sale'),
+                literal(-quantity),
+                literal(new_stock + quantity),
+                literal(new_stock),
+                new_sale.c.transaction_id,
+                literal('Sale transaction ') + new_sale.c.transaction_id
+            )
+        ).cte('movement')
+        sale = db.session.execute(select(new_sale).add_cte(movement)).one()
+        transaction_id = sale.transaction_id
 
         db.session.commit()
         logger.info(f"Created sale {transaction_id} for ${total_amount}")
@@ -142,7 +272,7 @@ def create_sale():
         return jsonify({
             'success': True,
             'message': 'Sale recorded successfully',
-            'sale': sale.to_dict(),
+            'sale': Sale.row_to_dict(sale),
             'receipt': {
                 'transaction_id': transaction_id,
                 'date': sale.sale_date.isoformat(),
@@ -191,9 +321,13 @@ def get_daily_sales():
     """Get daily sales summary"""
     try:
         target_date = request.args.get('date', date.today().isoformat())
-        daily_sales = Sale.get_daily_sales(datetime.strptime(target_date, '%Y-%m-%d').date())
+        daily_sales = Sale.get_daily_sales(
+            _parse_iso_date(target_date), include_transactions=_include_transactions()
+        )
         return jsonify({'success': True, 'analytics': daily_sales}), 200
 
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Validation error: {str(e)}'}), 400
     except Exception as e:
         logger.error(f"Error fetching daily sales: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -203,15 +337,18 @@ def get_daily_sales():
 def get_sales_by_period():
     """Get sales analytics for a date period"""
     try:
-        start_date = request.args.get('start_date', (date.today() - timedelta(days=30)).isoformat())
-        end_date = request.args.get('end_date', date.today().isoformat())
+        today = date.today()
+        start_date = request.args.get('start_date', (today - timedelta(days=30)).isoformat())
+        end_date = request.args.get('end_date', today.isoformat())
 
-        start = datetime.strptime(start_date, '%Y-%m-%d').date()
-        end = datetime.strptime(end_date, '%Y-%m-%d').date()
+        start = _parse_iso_date(start_date)
+        end = _parse_iso_date(end_date)
 
-        period_sales = Sale.get_sales_by_period(start, end)
+        period_sales = Sale.get_sales_by_period(start, end, include_transactions=_include_transactions())
         return jsonify({'success': True, 'analytics': period_sales}), 200
 
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Validation error: {str(e)}'}), 400
     except Exception as e:
         logger.error(f"Error fetching period sales: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -226,43 +363,37 @@ def get_top_drugs():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
 
+        revenue = func.sum(Sale.total_amount)
+
         query = db.session.query(
             Sale.drug_id,
             Drug.drug_name,
             Drug.manufacturer,
-            func.sum(Sale.quantity).label('total_quantity'),
-            func.sum(Sale.total_amount).label('total_revenue'),
-            func.count(Sale.id).label('transaction_count')
+            cast(func.sum(Sale.quantity), Integer).label('total_quantity'),
+            cast(revenue, Float).label('total_revenue'),
+            func.count().label('transaction_count'),
+            cast(revenue / func.count(), Float).label('average_sale_value')
         ).join(Drug, Sale.drug_id == Drug.id)
 
         if start_date:
-            query = query.filter(Sale.sale_date >= datetime.strptime(start_date, '%Y-%m-%d').date())
+            query = query.filter(Sale.sale_date >= _parse_iso_date(start_date))
         if end_date:
-            query = query.filter(Sale.sale_date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+            query = query.filter(Sale.sale_date <= _parse_iso_date(end_date))
 
         query = query.group_by(Sale.drug_id, Drug.drug_name, Drug.manufacturer)
 
         if by == 'revenue':
-            query = query.order_by(func.sum(Sale.total_amount).desc())
+            query = query.order_by(revenue.desc())
         else:
             query = query.order_by(func.sum(Sale.quantity).desc())
 
-        results = query.limit(limit).all()
-
-        top_drugs = []
-        for r in results:
-            top_drugs.append({
-                'drug_id': r[0],
-                'drug_name': r[1],
-                'manufacturer': r[2],
-                'total_quantity': int(r[3]),
-                'total_revenue': float(r[4]),
-                'transaction_count': r[5],
-                'average_sale_value': float(r[4]) / r[5] if r[5] > 0 else 0
-            })
+        # Typed columns come back as int/float, so rows map straight onto the response
+        top_drugs = [dict(r) for r in db.session.execute(query.limit(limit).statement).mappings()]
 
         return jsonify({'success': True, 'metric': by, 'limit': limit, 'top_drugs': top_drugs}), 200
 
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Validation error: {str(e)}'}), 400
     except Exception as e:
         logger.error(f"Error fetching top drugs: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -270,7 +401,12 @@ def get_top_drugs():
 
 @sales_bp.route('/sales/analytics/revenue-trend', methods=['GET'])
 def get_revenue_trend():
-    """Get revenue trend over time"""
+    """Get revenue trend over time
+
+    Aggregates the mv_sales_daily rollup, counting every day since its last
+    refresh live; sales dated before that refresh show up once the view is
+    refreshed again.
+    """
     try:
         period = request.args.get('period', 'monthly')
         months = int(request.args.get('months', 6))
@@ -279,20 +415,20 @@ def get_revenue_trend():
         start_date = end_date - timedelta(days=30 * months)
 
         if period == 'daily':
-            date_format = func.to_char(Sale.sale_date, 'YYYY-MM-DD')
+            date_format = func.to_char(current_sales_daily.c.sale_date, 'YYYY-MM-DD')
         elif period == 'weekly':
-            date_format = func.to_char(Sale.sale_date, 'IYYY-IW')
+            date_format = func.to_char(current_sales_daily.c.sale_date, 'IYYY-IW')
         else:
-            date_format = func.to_char(Sale.sale_date, 'YYYY-MM')
+            date_format = func.to_char(current_sales_daily.c.sale_date, 'YYYY-MM')
 
         results = db.session.query(
             date_format.label('period'),
-            func.sum(Sale.total_amount).label('revenue'),
-            func.sum(Sale.quantity).label('quantity'),
-            func.count(Sale.id).label('transactions')
+            func.sum(current_sales_daily.c.revenue).label('revenue'),
+            func.sum(current_sales_daily.c.quantity).label('quantity'),
+            cast(func.sum(current_sales_daily.c.transactions), Integer).label('transactions')
         ).filter(
-            Sale.sale_date >= start_date,
-            Sale.sale_date <= end_date
+            current_sales_daily.c.sale_date >= start_date,
+            current_sales_daily.c.sale_date <= end_date
         ).group_by(date_format).order_by(date_format).all()
 
         trend_data = []
@@ -324,34 +460,37 @@ def get_pharmacy_performance():
     try:
         limit = int(request.args.get('limit', 10))
 
+        first_sale = func.min(Sale.sale_date)
+        last_sale = func.max(Sale.sale_date)
+
+        # Casts and derived values are computed in SQL so rows are emitted as-is
         results = db.session.query(
             Sale.pharmacy_id,
             Sale.pharmacy_name,
-            func.count(Sale.id).label('transaction_count'),
-            func.sum(Sale.total_amount).label('total_revenue'),
-            func.sum(Sale.quantity).label('total_quantity'),
-            func.avg(Sale.total_amount).label('avg_transaction_value'),
-            func.max(Sale.total_amount).label('max_transaction'),
-            func.min(Sale.sale_date).label('first_sale'),
-            func.max(Sale.sale_date).label('last_sale')
+            func.count().label('transaction_count'),
+            cast(func.sum(Sale.total_amount), Float).label('total_revenue'),
+            cast(func.sum(Sale.quantity), Integer).label('total_quantity'),
+            func.coalesce(cast(func.avg(Sale.total_amount), Float), 0).label('avg_transaction_value'),
+            func.coalesce(cast(func.max(Sale.total_amount), Float), 0).label('max_transaction'),
+            first_sale.label('first_sale'),
+            last_sale.label('last_sale'),
+            func.coalesce(last_sale - first_sale, 0).label('active_days')
         ).group_by(Sale.pharmacy_id, Sale.pharmacy_name) \
          .order_by(func.sum(Sale.total_amount).desc()) \
          .limit(limit).all()
 
-        pharmacy_performance = []
-        for r in results:
-            pharmacy_performance.append({
-                'pharmacy_id': r[0],
-                'pharmacy_name': r[1],
-                'transaction_count': r[2],
-                'total_revenue': float(r[3]),
-                'total_quantity': int(r[4]),
-                'avg_transaction_value': float(r[5]) if r[5] else 0,
-                'max_transaction': float(r[6]) if r[6] else 0,
-                'first_sale': r[7].isoformat() if r[7] else None,
-                'last_sale': r[8].isoformat() if r[8] else None,
-                'active_days': (r[8] - r[7]).days if r[7] and r[8] else 0
-            })
+        pharmacy_performance = [{
+            'pharmacy_id': r.pharmacy_id,
+            'pharmacy_name': r.pharmacy_name,
+            'transaction_count': r.transaction_count,
+            'total_revenue': r.total_revenue,
+            'total_quantity': r.total_quantity,
+            'avg_transaction_value': r.avg_transaction_value,
+            'max_transaction': r.max_transaction,
+            'first_sale': r.first_sale.isoformat() if r.first_sale else None,
+            'last_sale': r.last_sale.isoformat() if r.last_sale else None,
+            'active_days': r.active_days
+        } for r in results]
 
         return jsonify({'success': True, 'limit': limit, 'pharmacies': pharmacy_performance}), 200
 
@@ -364,29 +503,33 @@ def get_pharmacy_performance():
 def get_payment_method_analysis():
     """Analyze sales by payment method"""
     try:
+        method_revenue = func.sum(Sale.total_amount)
+        # Window over the grouped rows gives the overall revenue alongside each method
+        overall_revenue = func.sum(method_revenue).over()
+
         results = db.session.query(
             Sale.payment_method,
             func.count(Sale.id).label('transaction_count'),
-            func.sum(Sale.total_amount).label('total_revenue'),
-            func.avg(Sale.total_amount).label('avg_transaction_value'),
-            func.sum(Sale.discount).label('total_discount')
+            cast(method_revenue, Float).label('total_revenue'),
+            func.coalesce(cast(func.avg(Sale.total_amount), Float), 0).label('avg_transaction_value'),
+            func.coalesce(cast(func.sum(Sale.discount), Float), 0).label('total_discount'),
+            cast(overall_revenue, Float).label('overall_revenue'),
+            func.coalesce(
+                cast(method_revenue * 100, Float) / cast(func.nullif(overall_revenue, 0), Float), 0
+            ).label('revenue_share')
         ).filter(Sale.payment_method.isnot(None)) \
          .group_by(Sale.payment_method) \
-         .order_by(func.sum(Sale.total_amount).desc()).all()
-
-        payment_analysis = []
-        total_revenue = sum(float(r[2]) for r in results)
-
-        for r in results:
-            revenue_share = (float(r[2]) / total_revenue * 100) if total_revenue > 0 else 0
-            payment_analysis.append({
-                'payment_method': r[0],
-                'transaction_count': r[1],
-                'total_revenue': float(r[2]),
-                'avg_transaction_value': float(r[3]) if r[3] else 0,
-                'total_discount': float(r[4]) if r[4] else 0,
-                'revenue_share_percent': round(revenue_share, 2)
-            })
+         .order_by(method_revenue.desc()).all()
+
+        total_revenue = results[0].overall_revenue if results else 0
+        payment_analysis = [{
+            'payment_method': r.payment_method,
+            'transaction_count': r.transaction_count,
+            'total_revenue': r.total_revenue,
+            'avg_transaction_value': r.avg_transaction_value,
+            'total_discount': r.total_discount,
+            'revenue_share_percent': round(r.revenue_share, 2)
+        } for r in results]
 
         return jsonify({'success': True, 'total_revenue': total_revenue, 'payment_methods': payment_analysis}), 200
 
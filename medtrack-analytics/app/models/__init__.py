@@ -1,13 +1,27 @@
+from sqlalchemy import DDL, event
+
+from app import db
 from app.models.drug import Drug
 from app.models.sale import Sale
 from app.models.patient import Patient
 from app.models.prescription import Prescription
 from app.models.inventory_transaction import InventoryTransaction
+from app.models.sales_daily import current_sales_daily, refresh_sales_daily, sales_daily
+
+# Trigram search indexes need pg_trgm before the tables are created
+event.listen(
+    db.metadata,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'),
+)
 
 __all__ = [
     'Drug',
     'Sale',
     'Patient',
     'Prescription',
-    'InventoryTransaction'
+    'InventoryTransaction',
+    'sales_daily',
+    'current_sales_daily',
+    'refresh_sales_daily'
 ]
@@ -1,12 +1,23 @@
 # app/models/drug.py
 from datetime import datetime
+from sqlalchemy import Computed, Float, and_, cast, func, or_, select
 from sqlalchemy.orm import validates
 
 from app import db
+from app.models.validation import apply_value_rule
 
 class Drug(db.Model):
     """Drug model representing pharmaceutical products"""
     __tablename__ = 'drugs'
+    __table_args__ = (
+        db.Index('idx_category', 'category'),
+        db.Index('idx_expiry_date', 'expiry_date', postgresql_where=db.text('expiry_date IS NOT NULL')),
+        # Trigram indexes serve the ILIKE '%q%' drug search
+        db.Index('idx_drug_name_trgm', 'drug_name', postgresql_using='gin', postgresql_ops={'drug_name': 'gin_trgm_ops'}),
+        db.Index('idx_generic_name_trgm', 'generic_name', postgresql_using='gin', postgresql_ops={'generic_name': 'gin_trgm_ops'}),
+        db.Index('idx_drug_code_trgm', 'drug_code', postgresql_using='gin', postgresql_ops={'drug_code': 'gin_trgm_ops'}),
+        db.Index('idx_manufacturer_trgm', 'manufacturer', postgresql_using='gin', postgresql_ops={'manufacturer': 'gin_trgm_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     drug_code = db.Column(db.String(20), unique=True, nullable=False)
@@ -18,6 +29,7 @@ class Drug(db.Model):
     unit_price = db.Column(db.Numeric(10, 2), nullable=False)
     cost_price = db.Column(db.Numeric(10, 2))
     stock_quantity = db.Column(db.Integer, default=0)
+    stock_value = db.Column(db.Numeric(14, 2), Computed('unit_price * stock_quantity', persisted=True))
     min_stock_level = db.Column(db.Integer, default=10)
     max_stock_level = db.Column(db.Integer, default=1000)
     expiry_date = db.Column(db.Date)
@@ -26,56 +38,56 @@ class Drug(db.Model):
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
-    sales = db.relationship('Sale', backref='drug', lazy=True)
-    prescriptions = db.relationship('Prescription', backref='drug', lazy=True)
-    inventory_transactions = db.relationship('InventoryTransaction', backref='drug', lazy=True)
-
-    @validates('unit_price')
-    def validate_unit_price(self, key, value):
-        if value <= 0:
-            raise ValueError("Unit price must be positive")
-        return value
-
-    @validates('stock_quantity')
-    def validate_stock_quantity(self, key, value):
-        if value < 0:
-            raise ValueError("Stock quantity cannot be negative")
-        return value
+    sales = db.relationship('Sale', back_populates='drug', lazy=True)
+    prescriptions = db.relationship('Prescription', back_populates='drug', lazy=True)
+    inventory_transactions = db.relationship(
+        'InventoryTransaction', backref='drug', lazy=True,
+        order_by='InventoryTransaction.transaction_date.desc()'
+    )
+
+    # Checked on attribute assignment and, through checked_value(), on Core writes
+    VALUE_RULES = {
+        'unit_price': (lambda value: value > 0, "Unit price must be positive"),
+        'stock_quantity': (lambda value: value >= 0, "Stock quantity cannot be negative"),
+    }
+
+    @validates(*VALUE_RULES)
+    def validate_value(self, key, value):
+        return apply_value_rule(Drug, key, value)
 
     def to_dict(self):
         """Convert model to dictionary"""
+        return Drug.row_to_dict(self)
+
+    @staticmethod
+    def row_to_dict(row):
+        """Convert a drug instance or a row of drug columns to a dictionary"""
         return {
-            'id': self.id,
-            'drug_code': self.drug_code,
-            'drug_name': self.drug_name,
-            'generic_name': self.generic_name,
-            'manufacturer': self.manufacturer,
-            'drug_class': self.drug_class,
-            'category': self.category,
-            'unit_price': float(self.unit_price) if self.unit_price else None,
-            'cost_price': float(self.cost_price) if self.cost_price else None,
-            'stock_quantity': self.stock_quantity,
-            'min_stock_level': self.min_stock_level,
-            'max_stock_level': self.max_stock_level,
-            'expiry_date': self.expiry_date.isoformat() if self.expiry_date else None,
-            'storage_conditions': self.storage_conditions,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'last_updated': self.last_updated.isoformat() if self.last_updated else None,
-            'needs_restock': self.needs_restock(),
-            'stock_value': self.get_stock_value(),
-            'days_to_expiry': self.get_days_to_expiry()
+            'id': row.id,
+            'drug_code': row.drug_code,
+            'drug_name': row.drug_name,
+            'generic_name': row.generic_name,
+            'manufacturer': row.manufacturer,
+            'drug_class': row.drug_class,
+            'category': row.category,
+            'unit_price': float(row.unit_price) if row.unit_price else None,
+            'cost_price': float(row.cost_price) if row.cost_price else None,
+            'stock_quantity': row.stock_quantity,
+            'min_stock_level': row.min_stock_level,
+            'max_stock_level': row.max_stock_level,
+            'expiry_date': row.expiry_date.isoformat() if row.expiry_date else None,
+            'storage_conditions': row.storage_conditions,
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+            'last_updated': row.last_updated.isoformat() if row.last_updated else None,
+            'needs_restock': Drug.needs_restock(row),
+            'stock_value': float(row.stock_value) if row.stock_value is not None else 0.0,
+            'days_to_expiry': Drug.get_days_to_expiry(row)
         }
 
     def needs_restock(self, threshold_multiplier=1.0):
         """Check if drug needs restocking"""
         return self.stock_quantity <= (self.min_stock_level * threshold_multiplier)
 
-    def get_stock_value(self):
-        """Calculate total value of stock"""
-        if self.unit_price and self.stock_quantity:
-            return float(self.unit_price * self.stock_quantity)
-        return 0.0
-
     def get_days_to_expiry(self):
         """Calculate days until expiry"""
         if self.expiry_date:
@@ -107,23 +119,48 @@ class Drug(db.Model):
         db.session.add(transaction)
         return transaction
 
+    @classmethod
+    def restock_ratio(cls):
+        """Stock relative to the minimum level, matching the idx_restock_ratio index"""
+        return cast(cls.stock_quantity, Float) / cast(func.nullif(cls.min_stock_level, 0), Float)
+
+    @classmethod
+    def low_stock_filter(cls, threshold_multiplier=1.5):
+        """stock_quantity <= min_stock_level * threshold_multiplier in indexable form
+
+        The ratio is NULL without a minimum, so drugs with min_stock_level = 0
+        are matched separately (out of stock) through idx_restock_no_minimum.
+        """
+        return or_(
+            cls.restock_ratio() <= threshold_multiplier,
+            and_(cls.min_stock_level == 0, cls.stock_quantity <= 0)
+        )
+
     @classmethod
     def get_low_stock_items(cls, threshold_multiplier=1.5):
-        """Get all drugs that are low in stock"""
-        return cls.query.filter(
-            cls.stock_quantity <= (cls.min_stock_level * threshold_multiplier)
-        ).order_by(cls.stock_quantity.asc()).all()
+        """Get all drugs that are low in stock as rows of drug columns"""
+        return db.session.execute(
+            select(*cls.__table__.c).where(
+                cls.low_stock_filter(threshold_multiplier)
+            ).order_by(cls.stock_quantity.asc())
+        ).all()
 
     @classmethod
     def get_expiring_soon(cls, days_threshold=30):
-        """Get drugs expiring within specified days"""
+        """Get drugs expiring within specified days as rows of drug columns"""
         from datetime import date, timedelta
         expiry_threshold = date.today() + timedelta(days=days_threshold)
 
-        return cls.query.filter(
-            cls.expiry_date <= expiry_threshold,
-            cls.expiry_date >= date.today()
-        ).order_by(cls.expiry_date.asc()).all()
+        return db.session.execute(
+            select(*cls.__table__.c).where(
+                cls.expiry_date <= expiry_threshold,
+                cls.expiry_date >= date.today()
+            ).order_by(cls.expiry_date.asc())
+        ).all()
 
     def __repr__(self):
         return f'<Drug {self.drug_code}: {self.drug_name}>'
+
+
+db.Index('idx_restock_ratio', Drug.restock_ratio())
+db.Index('idx_restock_no_minimum', Drug.stock_quantity, postgresql_where=Drug.min_stock_level == 0)
@@ -1,13 +1,28 @@
 # app/models/patient.py
 from datetime import datetime, date
-from sqlalchemy import Computed
+from sqlalchemy import Computed, Text, cast, func, select
 from sqlalchemy.orm import validates
 
 from app import db
+from app.models.validation import apply_value_rule
+
+# Source of server-assigned patient codes (PAT-0000000001, ...)
+patient_code_seq = db.Sequence('patient_code_seq', metadata=db.metadata)
 
 class Patient(db.Model):
     """Patient demographic model"""
     __tablename__ = 'patients'
+    __table_args__ = (
+        db.Index('idx_primary_condition', 'primary_condition'),
+        db.Index('idx_state', 'state'),
+        db.Index('idx_patient_name', 'last_name', 'first_name', 'id'),
+        # Trigram indexes serve the ILIKE '%q%' patient search
+        db.Index('idx_first_name_trgm', 'first_name', postgresql_using='gin', postgresql_ops={'first_name': 'gin_trgm_ops'}),
+        db.Index('idx_last_name_trgm', 'last_name', postgresql_using='gin', postgresql_ops={'last_name': 'gin_trgm_ops'}),
+        db.Index('idx_patient_code_trgm', 'patient_code', postgresql_using='gin', postgresql_ops={'patient_code': 'gin_trgm_ops'}),
+        db.Index('idx_primary_condition_trgm', 'primary_condition', postgresql_using='gin', postgresql_ops={'primary_condition': 'gin_trgm_ops'}),
+        db.Index('idx_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     patient_code = db.Column(db.String(50), unique=True, nullable=False)
@@ -27,40 +42,58 @@ class Patient(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationships
-    prescriptions = db.relationship('Prescription', backref='patient', lazy=True)
+    prescriptions = db.relationship(
+        'Prescription', back_populates='patient', lazy=True,
+        order_by='Prescription.date_prescribed.desc()'
+    )
 
-    @validates('email')
-    def validate_email(self, key, value):
-        if value and '@' not in value:
-            raise ValueError("Invalid email format")
-        return value
+    # Checked on attribute assignment and, through checked_value(), on Core writes
+    VALUE_RULES = {
+        'email': (lambda value: not value or '@' in value, "Invalid email format"),
+        'date_of_birth': (lambda value: value <= date.today(), "Date of birth cannot be in the future"),
+    }
 
-    @validates('date_of_birth')
-    def validate_date_of_birth(self, key, value):
-        if value > date.today():
-            raise ValueError("Date of birth cannot be in the future")
-        return value
+    @validates(*VALUE_RULES)
+    def validate_value(self, key, value):
+        return apply_value_rule(Patient, key, value)
 
     def to_dict(self):
         """Convert model to dictionary"""
+        return Patient.row_to_dict(self)
+
+    @staticmethod
+    def row_to_dict(row):
+        """Convert a patient instance or a row of patient columns to a dictionary"""
         return {
-            'id': self.id,
-            'patient_code': self.patient_code,
-            'first_name': self.first_name,
-            'last_name': self.last_name,
-            'date_of_birth': self.date_of_birth.isoformat() if self.date_of_birth else None,
-            'age': self.age,
-            'gender': self.gender,
-            'email': self.email,
-            'phone': self.phone,
-            'city': self.city,
-            'state': self.state,
-            'primary_condition': self.primary_condition,
-            'insurance_id': self.insurance_id,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'full_name': self.get_full_name()
+            'id': row.id,
+            'patient_code': row.patient_code,
+            'first_name': row.first_name,
+            'last_name': row.last_name,
+            'date_of_birth': row.date_of_birth.isoformat() if row.date_of_birth else None,
+            'age': row.age,
+            'gender': row.gender,
+            'email': row.email,
+            'phone': row.phone,
+            'city': row.city,
+            'state': row.state,
+            'primary_condition': row.primary_condition,
+            'insurance_id': row.insurance_id,
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+            'full_name': Patient.get_full_name(row)
         }
 
+    @staticmethod
+    def next_patient_code():
+        """SQL expression assigning the next patient code from patient_code_seq"""
+        return func.concat('PAT-', func.lpad(cast(patient_code_seq.next_value(), Text), 10, '0'))
+
+    @staticmethod
+    def reserve_patient_codes(connection, count):
+        """Draw count formatted patient codes from patient_code_seq in one query"""
+        return connection.execute(
+            select(Patient.next_patient_code()).select_from(func.generate_series(1, count))
+        ).scalars().all()
+
     def get_full_name(self):
         """Get patient's full name"""
         return f"{self.first_name} {self.last_name}".strip()
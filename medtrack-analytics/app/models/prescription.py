@@ -1,12 +1,29 @@
 # app/models/prescription.py
 from datetime import datetime, date, timedelta
-from sqlalchemy.orm import validates
+from sqlalchemy import Computed, Text, case, cast, func, update
+from sqlalchemy.orm import selectinload, validates
 
 from app import db
+from app.models.validation import apply_value_rule
+from app.session import request_cached
+
+# Source of server-assigned prescription codes (RX-YYYYMMDD-0000000001, ...)
+prescription_code_seq = db.Sequence('prescription_code_seq', metadata=db.metadata)
 
 class Prescription(db.Model):
     """Prescription model"""
     __tablename__ = 'prescriptions'
+    __table_args__ = (
+        db.Index('idx_date_prescribed', 'date_prescribed'),
+        # A patient's prescriptions and the active list are both read newest first
+        db.Index('idx_prescription_patient_date', 'patient_id', 'date_prescribed'),
+        db.Index('idx_prescription_status_date', 'status', 'date_prescribed'),
+        db.Index('idx_prescription_drug_id', 'drug_id'),
+        db.Index('idx_prescription_active_expiry', 'expires_at', postgresql_where=db.text("status = 'Active'")),
+        # Enforce the validator rules for Core/bulk writes, which bypass @validates
+        db.CheckConstraint('duration_days > 0', name='ck_prescriptions_duration_positive'),
+        db.CheckConstraint('refills_allowed >= 0 AND refills_used >= 0', name='ck_prescriptions_refills_non_negative'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     prescription_code = db.Column(db.String(50), unique=True, nullable=False)
@@ -20,32 +37,30 @@ class Prescription(db.Model):
     dosage = db.Column(db.String(100), nullable=False)
     frequency = db.Column(db.String(50), nullable=False)
     duration_days = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.Date, Computed('date_prescribed + duration_days', persisted=True))
     refills_allowed = db.Column(db.Integer, default=0)
     refills_used = db.Column(db.Integer, default=0)
     status = db.Column(db.String(20), default='Active')
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    @validates('duration_days')
-    def validate_duration_days(self, key, value):
-        if value <= 0:
-            raise ValueError("Duration must be positive")
-        return value
-
-    @validates('refills_allowed')
-    def validate_refills_allowed(self, key, value):
-        if value < 0:
-            raise ValueError("Refills cannot be negative")
-        return value
-
-    @validates('refills_used')
-    def validate_refills_used(self, key, value):
-        if value < 0:
-            raise ValueError("Refills used cannot be negative")
-        return value
-
-    def to_dict(self):
-        """Convert model to dictionary"""
+    # Relationships; loading them must be requested explicitly (selectinload/joinedload)
+    patient = db.relationship('Patient', back_populates='prescriptions', lazy='raise_on_sql')
+    drug = db.relationship('Drug', back_populates='prescriptions', lazy='raise_on_sql')
+
+    # Checked on attribute assignment and, through checked_value(), on Core writes
+    VALUE_RULES = {
+        'duration_days': (lambda value: value > 0, "Duration must be positive"),
+        'refills_allowed': (lambda value: value >= 0, "Refills cannot be negative"),
+        'refills_used': (lambda value: value >= 0, "Refills used cannot be negative"),
+    }
+
+    @validates(*VALUE_RULES)
+    def validate_value(self, key, value):
+        return apply_value_rule(Prescription, key, value)
+
+    def to_dict(self, today=None):
+        """Convert model to dictionary; pass today when serializing many prescriptions"""
         return {
             'id': self.id,
             'prescription_code': self.prescription_code,
@@ -64,17 +79,36 @@ class Prescription(db.Model):
             'status': self.status,
             'notes': self.notes,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'is_expired': self.is_expired(),
+            'is_expired': self.is_expired(today),
             'refills_remaining': self.refills_allowed - self.refills_used
         }
 
-    def is_expired(self):
+    @staticmethod
+    def next_prescription_code():
+        """SQL expression assigning the next prescription code from prescription_code_seq"""
+        return func.concat(
+            'RX-', func.to_char(func.current_date(), 'YYYYMMDD'), '-',
+            func.lpad(cast(prescription_code_seq.next_value(), Text), 10, '0')
+        )
+
+    @staticmethod
+    def serialize_many(prescriptions):
+        """Convert prescriptions to dictionaries, reading the current date once"""
+        today = date.today()
+        return [p.to_dict(today) for p in prescriptions]
+
+    def is_expired(self, today=None):
         """Check if prescription is expired"""
         if self.date_prescribed:
             expiry_date = self.date_prescribed + timedelta(days=self.duration_days)
-            return date.today() > expiry_date
+            return (today or date.today()) > expiry_date
         return False
 
+    @classmethod
+    def not_expired(cls):
+        """SQL form of `not is_expired()`, served by idx_prescription_active_expiry for active rows"""
+        return cls.expires_at >= func.current_date()
+
     def can_refill(self):
         """Check if prescription can be refilled"""
         return (self.refills_used < self.refills_allowed) and not self.is_expired() and self.status == 'Active'
@@ -88,12 +122,33 @@ class Prescription(db.Model):
             self.status = 'Completed'
 
     @classmethod
-    def get_active_prescriptions(cls, patient_id=None):
-        """Get active prescriptions, optionally filtered by patient"""
-        query = cls.query.filter_by(status='Active')
+    def dispense_bulk(cls, ids):
+        """Dispense many prescriptions with one UPDATE; returns the ids that were updated"""
+        refills_used = cls.refills_used + 1
+        return db.session.execute(
+            update(cls)
+            .where(cls.id.in_(ids))
+            .values(
+                date_dispensed=date.today(),
+                refills_used=refills_used,
+                status=case((refills_used >= cls.refills_allowed, 'Completed'), else_=cls.status)
+            )
+            .returning(cls.id)
+        ).scalars().all()
+
+    @classmethod
+    @request_cached
+    def get_active_prescriptions(cls, patient_id=None, exclude_expired=False):
+        """Get active prescriptions with their patient and drug loaded
+
+        Optionally filtered by patient, and to the unexpired ones in SQL.
+        """
+        query = cls.query.options(selectinload(cls.patient), selectinload(cls.drug)).filter_by(status='Active')
 
         if patient_id:
             query = query.filter_by(patient_id=patient_id)
+        if exclude_expired:
+            query = query.filter(cls.not_expired())
 
         return query.order_by(cls.date_prescribed.desc()).all()
 
@@ -1,15 +1,40 @@
 # app/models/sale.py
 from datetime import datetime
+from sqlalchemy import Float, case, cast, func, select
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import validates
 
 from app import db
+from app.models.validation import apply_value_rule
+
+# Source of server-assigned transaction ids (SALE-YYYYMMDD-0000000001, ...)
+sale_transaction_seq = db.Sequence('sale_transaction_seq', metadata=db.metadata)
 
 class Sale(db.Model):
     """Sales transaction model"""
     __tablename__ = 'sales'
+    __table_args__ = (
+        db.Index('idx_sale_date', 'sale_date'),
+        # Serves the keyset-paginated sales list ordering
+        db.Index('idx_sale_keyset', 'sale_date', db.text('COALESCE(sale_datetime, CAST(sale_date AS TIMESTAMP))'), 'id'),
+        db.Index('idx_sale_drug_date', 'drug_id', 'sale_date'),
+        # Covering indexes so date-ranged per-drug / per-pharmacy aggregates are index-only scans
+        db.Index('idx_sale_date_drug', 'sale_date', 'drug_id', postgresql_include=['quantity', 'total_amount']),
+        db.Index(
+            'idx_sale_date_pharmacy', 'sale_date', 'pharmacy_id',
+            postgresql_include=['pharmacy_name', 'total_amount', 'quantity']
+        ),
+        # Enforce the validator rules for Core/bulk writes, which bypass @validates
+        db.CheckConstraint('quantity > 0', name='ck_sales_quantity_positive'),
+        db.CheckConstraint('unit_price > 0', name='ck_sales_unit_price_positive'),
+        db.CheckConstraint('total_amount > 0', name='ck_sales_total_amount_positive'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    transaction_id = db.Column(db.String(50), unique=True, nullable=False)
+    # Assigned by the database and returned from the INSERT
+    transaction_id = db.Column(db.String(50), unique=True, nullable=False, server_default=db.text(
+        "'SALE-' || to_char(CURRENT_DATE, 'YYYYMMDD') || '-' || lpad(nextval('sale_transaction_seq')::text, 10, '0')"
+    ))
     drug_id = db.Column(db.Integer, db.ForeignKey('drugs.id'), nullable=False)
     sale_date = db.Column(db.Date, nullable=False)
     sale_datetime = db.Column(db.DateTime, default=datetime.utcnow)
@@ -25,81 +50,105 @@ class Sale(db.Model):
     insurance_provider = db.Column(db.String(100))
     prescription_id = db.Column(db.String(50))
 
-    @validates('quantity')
-    def validate_quantity(self, key, value):
-        if value <= 0:
-            raise ValueError("Quantity must be positive")
-        return value
+    # Loading the drug must be requested explicitly (joinedload/selectinload)
+    drug = db.relationship('Drug', back_populates='sales', lazy='raise_on_sql')
 
-    @validates('unit_price')
-    def validate_unit_price(self, key, value):
-        if value <= 0:
-            raise ValueError("Unit price must be positive")
-        return value
+    # Checked on attribute assignment and, through checked_value(), on Core writes
+    VALUE_RULES = {
+        'quantity': (lambda value: value > 0, "Quantity must be positive"),
+        'unit_price': (lambda value: value > 0, "Unit price must be positive"),
+        'total_amount': (lambda value: value > 0, "Total amount must be positive"),
+    }
 
-    @validates('total_amount')
-    def validate_total_amount(self, key, value):
-        if value <= 0:
-            raise ValueError("Total amount must be positive")
-        return value
+    @validates(*VALUE_RULES)
+    def validate_value(self, key, value):
+        return apply_value_rule(Sale, key, value)
 
-    def calculate_total(self):
-        """Calculate total amount"""
+    @hybrid_property
+    def computed_total(self):
+        """Total implied by price, quantity, discount and tax, floored at zero"""
         subtotal = self.unit_price * self.quantity
         discounted = subtotal - self.discount
         total = discounted + self.tax_amount
         return max(total, 0)
 
+    @computed_total.expression
+    def computed_total(cls):
+        total = (cls.unit_price * cls.quantity) - cls.discount + cls.tax_amount
+        return case((total < 0, 0), else_=total)
+
+    def calculate_total(self):
+        """Calculate total amount"""
+        return self.computed_total
+
     def to_dict(self):
         """Convert model to dictionary"""
+        return Sale.row_to_dict(self)
+
+    @staticmethod
+    def row_to_dict(row):
+        """Convert a sale instance or a row of sale columns to a dictionary"""
         return {
-            'id': self.id,
-            'transaction_id': self.transaction_id,
-            'drug_id': self.drug_id,
-            'sale_date': self.sale_date.isoformat() if self.sale_date else None,
-            'sale_datetime': self.sale_datetime.isoformat() if self.sale_datetime else None,
-            'quantity': self.quantity,
-            'unit_price': float(self.unit_price) if self.unit_price else None,
-            'discount': float(self.discount) if self.discount else None,
-            'tax_amount': float(self.tax_amount) if self.tax_amount else None,
-            'total_amount': float(self.total_amount) if self.total_amount else None,
-            'pharmacy_id': self.pharmacy_id,
-            'pharmacy_name': self.pharmacy_name,
-            'payment_method': self.payment_method,
-            'insurance_provider': self.insurance_provider,
-            'prescription_id': self.prescription_id
+            'id': row.id,
+            'transaction_id': row.transaction_id,
+            'drug_id': row.drug_id,
+            'sale_date': row.sale_date.isoformat() if row.sale_date else None,
+            'sale_datetime': row.sale_datetime.isoformat() if row.sale_datetime else None,
+            'quantity': row.quantity,
+            'unit_price': float(row.unit_price) if row.unit_price else None,
+            'discount': float(row.discount) if row.discount else None,
+            'tax_amount': float(row.tax_amount) if row.tax_amount else None,
+            'total_amount': float(row.total_amount) if row.total_amount else None,
+            'pharmacy_id': row.pharmacy_id,
+            'pharmacy_name': row.pharmacy_name,
+            'payment_method': row.payment_method,
+            'insurance_provider': row.insurance_provider,
+            'prescription_id': row.prescription_id
+        }
+
+    @classmethod
+    def summarize(cls, *criteria, include_transactions=False):
+        """Aggregate totals for the matching sales, optionally with the sales themselves"""
+        totals = db.session.execute(
+            select(
+                func.count().label('total_sales'),
+                func.coalesce(cast(func.sum(cls.total_amount), Float), 0).label('total_revenue'),
+                func.coalesce(func.sum(cls.quantity), 0).label('total_quantity')
+            ).where(*criteria)
+        ).one()
+
+        summary = {
+            'total_sales': totals.total_sales,
+            'total_revenue': totals.total_revenue,
+            'total_quantity': totals.total_quantity
         }
+        if include_transactions:
+            rows = db.session.execute(select(*cls.__table__.c).where(*criteria))
+            summary['transactions'] = [Sale.row_to_dict(row) for row in rows]
+        return summary
 
     @classmethod
-    def get_daily_sales(cls, date=None):
-        """Get sales for a specific date or today"""
+    def get_daily_sales(cls, date=None, include_transactions=False):
+        """Get sales totals for a specific date or today"""
         from datetime import date as date_class
         query_date = date or date_class.today()
 
-        sales = cls.query.filter_by(sale_date=query_date).all()
         return {
             'date': query_date.isoformat(),
-            'total_sales': len(sales),
-            'total_revenue': sum(float(s.total_amount) for s in sales),
-            'total_quantity': sum(s.quantity for s in sales),
-            'transactions': [s.to_dict() for s in sales]
+            **cls.summarize(cls.sale_date == query_date, include_transactions=include_transactions)
         }
 
     @classmethod
-    def get_sales_by_period(cls, start_date, end_date):
-        """Get sales within a date range"""
-        sales = cls.query.filter(
-            cls.sale_date >= start_date,
-            cls.sale_date <= end_date
-        ).all()
-
+    def get_sales_by_period(cls, start_date, end_date, include_transactions=False):
+        """Get sales totals within a date range"""
         return {
             'start_date': start_date.isoformat(),
             'end_date': end_date.isoformat(),
-            'total_sales': len(sales),
-            'total_revenue': sum(float(s.total_amount) for s in sales),
-            'total_quantity': sum(s.quantity for s in sales),
-            'transactions': [s.to_dict() for s in sales]
+            **cls.summarize(
+                cls.sale_date >= start_date,
+                cls.sale_date <= end_date,
+                include_transactions=include_transactions
+            )
         }
 
     def __repr__(self):
@@ -0,0 +1,72 @@
+# app/models/sales_daily.py
+from sqlalchemy import DDL, Date, cast, column, event, func, literal, select, table, text, union_all
+
+from app import db
+from app.models.sale import Sale
+
+# Daily per-drug sales rollup backing the dashboard aggregates. It is a
+# materialized view rather than a model, so it stays out of the metadata
+# and is created alongside the tables instead.
+sales_daily = table(
+    'mv_sales_daily',
+    column('sale_date'),
+    column('drug_id'),
+    column('revenue'),
+    column('quantity'),
+    column('transactions'),
+    column('refreshed_on'),
+)
+
+CREATE_SALES_DAILY = DDL(
+    'CREATE MATERIALIZED VIEW IF NOT EXISTS mv_sales_daily AS '
+    'SELECT sale_date, drug_id, SUM(total_amount) AS revenue, '
+    'SUM(quantity) AS quantity, COUNT(*) AS transactions, '
+    'CURRENT_DATE AS refreshed_on '
+    'FROM sales GROUP BY sale_date, drug_id'
+)
+CREATE_SALES_DAILY_INDEX = DDL(
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_sales_daily '
+    'ON mv_sales_daily (sale_date, drug_id)'
+)
+
+event.listen(db.metadata, 'after_create', CREATE_SALES_DAILY.execute_if(dialect='postgresql'))
+event.listen(db.metadata, 'after_create', CREATE_SALES_DAILY_INDEX.execute_if(dialect='postgresql'))
+
+
+def refresh_sales_daily(connection):
+    """Refresh the daily sales rollup without blocking readers"""
+    connection.execute(text('REFRESH MATERIALIZED VIEW CONCURRENTLY mv_sales_daily'))
+
+
+def _build_current_sales_daily():
+    """Rollup rows for days before the last refresh plus a live aggregate since then"""
+    sales = Sale.__table__
+    # Every row carries the date of the refresh that produced it; an empty
+    # or never-refreshed view leaves all sales to the live aggregate
+    cutoff = func.coalesce(
+        select(sales_daily.c.refreshed_on).limit(1).scalar_subquery(),
+        cast(literal('-infinity'), Date)
+    )
+    closed_days = select(
+        sales_daily.c.sale_date,
+        sales_daily.c.drug_id,
+        sales_daily.c.revenue,
+        sales_daily.c.quantity,
+        sales_daily.c.transactions,
+    ).where(sales_daily.c.sale_date < cutoff)
+    open_days = select(
+        sales.c.sale_date,
+        sales.c.drug_id,
+        func.sum(sales.c.total_amount).label('revenue'),
+        func.sum(sales.c.quantity).label('quantity'),
+        func.count().label('transactions'),
+    ).where(sales.c.sale_date >= cutoff) \
+     .group_by(sales.c.sale_date, sales.c.drug_id)
+    return union_all(closed_days, open_days).subquery('current_sales_daily')
+
+
+# Same columns as sales_daily, with every day since the view was last
+# refreshed aggregated live, so new sales count no matter when the refresh
+# runs. Sales written or changed for days before that refresh still wait
+# for the next refresh_sales_daily().
+current_sales_daily = _build_current_sales_daily()
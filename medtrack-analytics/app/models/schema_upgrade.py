@@ -0,0 +1,92 @@
+# app/models/schema_upgrade.py
+from sqlalchemy import CheckConstraint, inspect, text
+from sqlalchemy.schema import CreateColumn
+
+from app import db
+from app.models.sales_daily import CREATE_SALES_DAILY, CREATE_SALES_DAILY_INDEX
+
+# create_all() only creates what is missing entirely, so databases provisioned
+# by an older `flask create-db` never get the columns, defaults, constraints and
+# indexes later added to existing tables. upgrade_schema() adds them from the
+# models; every step checks the catalog first, so re-running it is a no-op.
+
+# Indexes whose definition changed under the same name, with a LIKE pattern
+# the current definition in pg_indexes matches
+CHANGED_INDEXES = {
+    'idx_expiry_date': '%WHERE%',
+    'idx_patient_name': '%, id)',
+    'idx_sale_keyset': '%COALESCE%',
+}
+
+
+def _add_missing_columns(connection, inspector, table):
+    """Add model columns the table lacks and server defaults it never got"""
+    quoted_table = connection.dialect.identifier_preparer.format_table(table)
+    existing = {col['name']: col for col in inspector.get_columns(table.name)}
+    for column in table.columns:
+        if column.name not in existing:
+            # Generated columns are computed for the existing rows as they are added
+            column_ddl = CreateColumn(column).compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {quoted_table} ADD COLUMN {column_ddl}"))
+        elif column.computed is None and column.server_default is not None \
+                and existing[column.name]['default'] is None:
+            default = column.server_default.arg.compile(dialect=connection.dialect)
+            quoted_column = connection.dialect.identifier_preparer.quote(column.name)
+            connection.execute(text(
+                f"ALTER TABLE {quoted_table} ALTER COLUMN {quoted_column} SET DEFAULT {default}"
+            ))
+
+
+def _add_missing_checks(connection, table):
+    """Add named CHECK constraints, enforced for new writes without rescanning old rows"""
+    quoted_table = connection.dialect.identifier_preparer.format_table(table)
+    existing = set(connection.execute(
+        text('SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass)'),
+        {'table': table.name}
+    ).scalars())
+    for constraint in table.constraints:
+        if isinstance(constraint, CheckConstraint) and constraint.name and constraint.name not in existing:
+            quoted_name = connection.dialect.identifier_preparer.quote(constraint.name)
+            connection.execute(text(
+                f"ALTER TABLE {quoted_table} ADD CONSTRAINT {quoted_name} "
+                f"CHECK ({constraint.sqltext}) NOT VALID"
+            ))
+
+
+def _create_missing_indexes(connection, table):
+    """Rebuild indexes whose definition changed, then create any that are missing"""
+    for index in table.indexes:
+        pattern = CHANGED_INDEXES.get(index.name)
+        if pattern is not None and connection.execute(
+            text('SELECT 1 FROM pg_indexes WHERE indexname = :name AND indexdef NOT LIKE :pattern'),
+            {'name': index.name, 'pattern': pattern}
+        ).first():
+            connection.execute(text(f"DROP INDEX {connection.dialect.identifier_preparer.quote(index.name)}"))
+        index.create(connection, checkfirst=True)
+
+
+def _recreate_stale_sales_daily(connection):
+    """Recreate mv_sales_daily when it predates the refreshed_on column"""
+    stale = connection.execute(text(
+        "SELECT to_regclass('mv_sales_daily') IS NOT NULL AND NOT EXISTS ("
+        "SELECT 1 FROM pg_attribute "
+        "WHERE attrelid = to_regclass('mv_sales_daily') AND attname = 'refreshed_on')"
+    )).scalar()
+    if stale:
+        connection.execute(text('DROP MATERIALIZED VIEW mv_sales_daily'))
+        connection.execute(CREATE_SALES_DAILY)
+        connection.execute(CREATE_SALES_DAILY_INDEX)
+
+
+def upgrade_schema(connection):
+    """Bring an existing PostgreSQL database up to the current models"""
+    # Missing tables, sequences, the pg_trgm extension and the rollup view
+    db.metadata.create_all(connection)
+
+    inspector = inspect(connection)
+    for table in db.metadata.sorted_tables:
+        _add_missing_columns(connection, inspector, table)
+        _add_missing_checks(connection, table)
+        _create_missing_indexes(connection, table)
+
+    _recreate_stale_sales_daily(connection)
@@ -0,0 +1,48 @@
+# app/models/validation.py
+from datetime import date, datetime
+from decimal import Decimal
+
+# Each model declares VALUE_RULES = {field: (predicate, message)} once; its
+# @validates hook and the Core/bulk write paths (which bypass @validates)
+# both check values through the functions below, so the rules cannot drift.
+
+
+def apply_value_rule(model, field, value):
+    """Raise ValueError when value breaks the model's rule for field"""
+    rule = model.VALUE_RULES.get(field)
+    if value is not None and rule is not None and not rule[0](value):
+        raise ValueError(rule[1])
+    return value
+
+
+def checked_value(model, field, value):
+    """Coerce a value to the model column's type and apply its value rule
+
+    For rows written with Core INSERT/UPDATE statements. Raises ValueError
+    when the value does not fit the column.
+    """
+    if value is None:
+        return None
+
+    column_type = model.__table__.c[field].type
+    python_type = column_type.python_type
+    if python_type is int:
+        value = int(value)
+    elif python_type is Decimal:
+        value = float(value)
+    elif python_type is datetime:
+        value = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    elif python_type is date:
+        value = value if isinstance(value, date) else date.fromisoformat(value)
+    else:
+        value = str(value)
+        length = getattr(column_type, 'length', None)
+        if length is not None and len(value) > length:
+            raise ValueError(f"{field} must be at most {length} characters")
+
+    return apply_value_rule(model, field, value)
+
+
+def checked_values(model, values):
+    """checked_value() applied to every field of a row of column values"""
+    return {field: checked_value(model, field, value) for field, value in values.items()}
@@ -1,26 +1,100 @@
+import functools
+import io
 import json
 import logging
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import date, datetime, timedelta
 
 import numpy as np
+import orjson
 import pandas as pd
 from faker import Faker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # pyarrow is optional; fall back to the pandas writer
+    pa = None
 
 from app import db
 from app.models.drug import Drug
 from app.models.patient import Patient
 from app.models.prescription import Prescription
 from app.models.sale import Sale
+from app.models.sales_daily import refresh_sales_daily
+
+
+def _copy_on_write(transform):
+    """Run a transform with pandas copy-on-write enabled for that call only
+
+    Transforms derive from the input frame lazily instead of copying it up
+    front; scoping the option keeps it from leaking into the rest of the
+    process.
+    """
+    @functools.wraps(transform)
+    def wrapper(*args, **kwargs):
+        with pd.option_context('mode.copy_on_write', True):
+            return transform(*args, **kwargs)
+    return wrapper
 
 
 class PharmaDataPipeline:
     """Main data pipeline class for pharmaceutical data processing"""
 
+    # Source column names normalized by each transform
+    COLUMN_MAP_DRUGS = {
+        'DrugCode': 'drug_code',
+        'DrugName': 'drug_name',
+        'GenericName': 'generic_name',
+        'Manufacturer': 'manufacturer',
+        'Category': 'category',
+        'UnitPrice': 'unit_price',
+        'Stock': 'stock_quantity',
+        'ExpiryDate': 'expiry_date',
+        'Drug_ID': 'drug_code',
+        'Product_Name': 'drug_name',
+        'MFR': 'manufacturer',
+    }
+
+    COLUMN_MAP_SALES = {
+        'TransactionID': 'transaction_id',
+        'SaleDate': 'sale_date',
+        'DrugID': 'drug_id',
+        'Quantity': 'quantity',
+        'Price': 'unit_price',
+        'Total': 'total_amount',
+        'Pharmacy': 'pharmacy_name',
+        'PaymentMethod': 'payment_method',
+    }
+
+    COLUMN_MAP_PATIENTS = {
+        'PatientID': 'patient_code',
+        'FirstName': 'first_name',
+        'LastName': 'last_name',
+        'DOB': 'date_of_birth',
+        'Gender': 'gender',
+        'Email': 'email',
+        'Phone': 'phone',
+        'Condition': 'primary_condition',
+        'Insurance': 'insurance_id',
+    }
+
+    # Natural key each ETL table is upserted on
+    UPSERT_KEYS = {
+        'drugs': 'drug_code',
+        'sales': 'transaction_id',
+        'patients': 'patient_code',
+    }
+
+    DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
     def __init__(self, config_path='config/pipeline_config.json'):
         self.logger = self._setup_logging()
         self.faker = Faker()
+        self._faker_pools = {}
+        self.config_path = config_path
         self.config = self._load_config(config_path)
 
         # Database connection
@@ -110,11 +184,7 @@ class PharmaDataPipeline:
                         'drugs', 'data/raw/drugs.csv'
                     )
 
-                # Read CSV with error handling
-                try:
-                    df = pd.read_csv(file_path, encoding='utf-8')
-                except UnicodeDecodeError:
-                    df = pd.read_csv(file_path, encoding='latin-1')
+                df = self.read_csv(file_path)
 
                 self.logger.info(
                     f"Extracted {len(df)} rows from CSV: {file_path}"
@@ -152,84 +222,54 @@ class PharmaDataPipeline:
             self.logger.error(f"Error extracting data: {str(e)}")
             raise
 
+    @_copy_on_write
     def transform_drugs(self, df):
         """Transform drugs data"""
         self.logger.info('Transforming drugs data')
-        df_clean = df.copy()
-
-        column_mapping = {
-            'DrugCode': 'drug_code',
-            'DrugName': 'drug_name',
-            'GenericName': 'generic_name',
-            'Manufacturer': 'manufacturer',
-            'Category': 'category',
-            'UnitPrice': 'unit_price',
-            'Stock': 'stock_quantity',
-            'ExpiryDate': 'expiry_date',
-            'Drug_ID': 'drug_code',
-            'Product_Name': 'drug_name',
-            'MFR': 'manufacturer',
-        }
-        df_clean.columns = [column_mapping.get(col, col) for col in df_clean.columns]
+        df_clean = df.rename(columns=self.COLUMN_MAP_DRUGS)
 
-        if 'unit_price' in df_clean.columns:
-            df_clean['unit_price'] = pd.to_numeric(
-                df_clean['unit_price'], errors='coerce'
-            )
+        df_clean = df_clean.dropna(subset=['drug_code', 'drug_name'])
 
+        # Collect every derivation and apply them in a single assign pass
+        derived = {}
+        if 'unit_price' in df_clean.columns:
+            derived['unit_price'] = pd.to_numeric(df_clean['unit_price'], errors='coerce')
         if 'stock_quantity' in df_clean.columns:
-            df_clean['stock_quantity'] = (
+            derived['stock_quantity'] = (
                 pd.to_numeric(df_clean['stock_quantity'], errors='coerce')
                 .fillna(0)
-                .astype(int)
+                .astype('int32')
             )
-
         if 'expiry_date' in df_clean.columns:
-            df_clean['expiry_date'] = pd.to_datetime(
-                df_clean['expiry_date'], errors='coerce'
+            derived['expiry_date'] = pd.to_datetime(
+                df_clean['expiry_date'], errors='coerce', format='ISO8601'
             )
-
-        df_clean = df_clean.dropna(subset=['drug_code', 'drug_name'])
-
         if 'category' not in df_clean.columns:
-            df_clean['category'] = 'Prescription'
-
+            derived['category'] = 'Prescription'
         if 'min_stock_level' not in df_clean.columns:
-            df_clean['min_stock_level'] = 10
-
+            derived['min_stock_level'] = 10
         if 'max_stock_level' not in df_clean.columns:
-            df_clean['max_stock_level'] = 1000
-
-        df_clean['stock_value'] = df_clean['unit_price'] * df_clean['stock_quantity']
+            derived['max_stock_level'] = 1000
 
+        derived['stock_value'] = lambda d: d['unit_price'] * d['stock_quantity']
         if 'expiry_date' in df_clean.columns:
-            df_clean['days_to_expiry'] = (
-                df_clean['expiry_date'] - pd.Timestamp.today()
-            ).dt.days
+            today = pd.Timestamp.today()
+            derived['days_to_expiry'] = lambda d: (d['expiry_date'] - today).dt.days
+
+        df_clean = df_clean.assign(**derived)
 
         self.logger.info(f"Transformed {len(df_clean)} drug records")
         return df_clean
 
+    @_copy_on_write
     def transform_sales(self, df):
         """Transform sales data"""
         self.logger.info('Transforming sales data')
-        df_clean = df.copy()
-
-        column_mapping = {
-            'TransactionID': 'transaction_id',
-            'SaleDate': 'sale_date',
-            'DrugID': 'drug_id',
-            'Quantity': 'quantity',
-            'Price': 'unit_price',
-            'Total': 'total_amount',
-            'Pharmacy': 'pharmacy_name',
-            'PaymentMethod': 'payment_method',
-        }
-        df_clean.columns = [column_mapping.get(col, col) for col in df_clean.columns]
+        df_clean = df.rename(columns=self.COLUMN_MAP_SALES)
 
         if 'sale_date' in df_clean.columns:
             df_clean['sale_date'] = pd.to_datetime(
-                df_clean['sale_date'], errors='coerce'
+                df_clean['sale_date'], errors='coerce', format='ISO8601'
             )
 
         for col in ['quantity', 'unit_price', 'total_amount', 'discount', 'tax_amount']:
@@ -241,68 +281,64 @@ class PharmaDataPipeline:
         ):
             df_clean['total_amount'] = df_clean['unit_price'] * df_clean['quantity']
 
-        df_clean['year'] = df_clean['sale_date'].dt.year
-        df_clean['month'] = df_clean['sale_date'].dt.month
-        df_clean['day'] = df_clean['sale_date'].dt.day
-        df_clean['day_of_week'] = df_clean['sale_date'].dt.day_name()
-
-        df_clean = df_clean.dropna(subset=['transaction_id', 'drug_id', 'sale_date'])
-        df_clean = df_clean[df_clean['quantity'] > 0]
+        # Keep complete rows with a positive quantity in a single filtering pass
+        keep = df_clean[['transaction_id', 'drug_id', 'sale_date']].notna().all(axis=1)
+        df_clean = df_clean.loc[keep & (df_clean['quantity'] > 0)]
+
+        # Every remaining row has a date and quantity, so these fit narrow integer types
+        sale_date = df_clean['sale_date'].dt
+        df_clean = df_clean.astype({'quantity': 'int32'}).assign(
+            year=sale_date.year.astype('int16'),
+            month=sale_date.month.astype('int8'),
+            day=sale_date.day.astype('int8'),
+            day_of_week=pd.Categorical.from_codes(sale_date.dayofweek, categories=self.DAY_NAMES),
+        )
 
         self.logger.info(f"Transformed {len(df_clean)} sales records")
         return df_clean
 
+    @_copy_on_write
     def transform_patients(self, df):
         """Transform patient data"""
         self.logger.info('Transforming patient data')
-        df_clean = df.copy()
-
-        column_mapping = {
-            'PatientID': 'patient_code',
-            'FirstName': 'first_name',
-            'LastName': 'last_name',
-            'DOB': 'date_of_birth',
-            'Gender': 'gender',
-            'Email': 'email',
-            'Phone': 'phone',
-            'Condition': 'primary_condition',
-            'Insurance': 'insurance_id',
-        }
-        df_clean.columns = [column_mapping.get(col, col) for col in df_clean.columns]
+        df_clean = df.rename(columns=self.COLUMN_MAP_PATIENTS)
 
         if 'date_of_birth' in df_clean.columns:
             df_clean['date_of_birth'] = pd.to_datetime(
-                df_clean['date_of_birth'], errors='coerce'
+                df_clean['date_of_birth'], errors='coerce', format='ISO8601'
             )
-            today = pd.Timestamp.today()
-            df_clean['age'] = (
-                (today - df_clean['date_of_birth']).dt.days / 365.25
-            ).astype(int)
 
         if 'email' in df_clean.columns:
-            email_mask = df_clean['email'].str.contains('@', na=False)
-            df_clean.loc[~email_mask, 'email'] = None
+            email_mask = df_clean['email'].str.contains('@', na=False, regex=False)
+            df_clean['email'] = df_clean['email'].where(email_mask, None)
 
         if 'gender' in df_clean.columns:
-            df_clean['gender'] = df_clean['gender'].str.upper().map(
-                {
-                    'M': 'Male',
-                    'MALE': 'Male',
-                    'F': 'Female',
-                    'FEMALE': 'Female',
-                    'O': 'Other',
-                    'OTHER': 'Other',
-                }
-            )
+            gender_map = {
+                'M': 'Male',
+                'MALE': 'Male',
+                'F': 'Female',
+                'FEMALE': 'Female',
+                'O': 'Other',
+                'OTHER': 'Other',
+            }
+            # Normalize each distinct spelling once and map the codes, not every row
+            genders = df_clean['gender'].astype('category')
+            df_clean['gender'] = genders.map(
+                {value: gender_map.get(str(value).upper()) for value in genders.cat.categories}
+            ).astype(object)
 
         df_clean = df_clean.dropna(subset=['first_name', 'last_name', 'date_of_birth'])
 
-        if 'patient_code' not in df_clean.columns:
-            import uuid
+        if 'date_of_birth' in df_clean.columns:
+            # Whole days lived, then floor(days / 365.25) in integer arithmetic
+            dob = df_clean['date_of_birth'].to_numpy().astype('datetime64[D]')
+            age_days = (np.datetime64(date.today(), 'D') - dob).astype('int64')
+            df_clean['age'] = (age_days * 4 // 1461).astype('int32')
 
-            df_clean['patient_code'] = [
-                f"PAT-{str(uuid.uuid4())[:8].upper()}" for _ in range(len(df_clean))
-            ]
+        if 'patient_code' not in df_clean.columns:
+            # Draw codes from the same sequence the API uses, in one round-trip
+            with self.db_engine.connect() as conn:
+                df_clean['patient_code'] = Patient.reserve_patient_codes(conn, len(df_clean))
 
         self.logger.info(f"Transformed {len(df_clean)} patient records")
         return df_clean
@@ -310,10 +346,11 @@ class PharmaDataPipeline:
     def validate_data_quality(self, df, data_type):
         """Validate data quality and create quality report"""
         self.logger.info(f"Validating {data_type} data quality")
+        now = datetime.now()
 
         validation_report = {
             'data_type': data_type,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
             'total_records': len(df),
             'valid_records': 0,
             'invalid_records': 0,
@@ -338,9 +375,16 @@ class PharmaDataPipeline:
             numeric_fields = []
             date_fields = []
 
+        # One null count over every checked column instead of a scan per field
+        checked_fields = [
+            field for field in dict.fromkeys(required_fields + numeric_fields + date_fields)
+            if field in df.columns
+        ]
+        null_counts = df[checked_fields].isna().sum()
+
         for field in required_fields:
             if field in df.columns:
-                null_count = df[field].isna().sum()
+                null_count = null_counts[field]
                 if null_count > 0:
                     validation_report['issues'].append(
                         {
@@ -352,7 +396,11 @@ class PharmaDataPipeline:
 
         for field in numeric_fields:
             if field in df.columns:
-                non_numeric = (~pd.to_numeric(df[field], errors='coerce').notna()).sum()
+                # Transformed columns are already numeric; only coerce the ones that are not
+                if pd.api.types.is_numeric_dtype(df[field]):
+                    non_numeric = null_counts[field]
+                else:
+                    non_numeric = pd.to_numeric(df[field], errors='coerce').isna().sum()
                 if non_numeric > 0:
                     validation_report['issues'].append(
                         {
@@ -364,7 +412,7 @@ class PharmaDataPipeline:
 
         for field in date_fields:
             if field in df.columns:
-                invalid_dates = df[field].isna().sum()
+                invalid_dates = null_counts[field]
                 if invalid_dates > 0:
                     validation_report['issues'].append(
                         {
@@ -392,28 +440,40 @@ class PharmaDataPipeline:
 
         report_file = (
             f"{self.config['output']['reports_path']}quality_report_{data_type}_"
-            f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            f"{now.strftime('%Y%m%d_%H%M%S')}.json"
         )
         os.makedirs(os.path.dirname(report_file), exist_ok=True)
-
-        with open(report_file, 'w') as f:
-            json.dump(validation_report, f, indent=2)
+        self._write_json(report_file, validation_report)
 
         self.logger.info(f"Data quality report saved: {report_file}")
         return validation_report
 
     def load_to_database(self, df, table_name, mode='append'):
-        """Load transformed data to database"""
+        """Load transformed data to database
+
+        mode is 'append', 'replace' (empty the table first) or 'upsert'
+        (insert new rows and update existing ones by the table's UPSERT_KEYS
+        column, PostgreSQL only).
+        """
         self.logger.info(f"Loading {len(df)} records to {table_name} (mode: {mode})")
 
         try:
-            df.head(0).to_sql(table_name, self.db_engine, if_exists='replace', index=False)
-
-            chunksize = self.config['processing']['chunk_size']
-            for i in range(0, len(df), chunksize):
-                chunk = df.iloc[i : i + chunksize]
-                chunk.to_sql(table_name, self.db_engine, if_exists=mode, index=False)
-                self.logger.info(f"Loaded chunk {i // chunksize + 1}")
+            df, created = self._prepare_target_table(df, table_name, mode)
+
+            if self.db_engine.dialect.name == 'postgresql':
+                upsert_key = self.UPSERT_KEYS.get(table_name)
+                if mode == 'upsert' and not created and upsert_key in df.columns:
+                    self._upsert_into_table(df, table_name, upsert_key)
+                else:
+                    self._copy_to_table(df, table_name)
+            elif mode == 'upsert':
+                raise ValueError('Upsert loads require PostgreSQL')
+            else:
+                chunksize = self.config['processing']['chunk_size']
+                for i in range(0, len(df), chunksize):
+                    chunk = df.iloc[i : i + chunksize]
+                    chunk.to_sql(table_name, self.db_engine, if_exists='append', index=False)
+                    self.logger.info(f"Loaded chunk {i // chunksize + 1}")
 
             self.logger.info(f"Successfully loaded {len(df)} records to {table_name}")
             return True
@@ -422,6 +482,98 @@ class PharmaDataPipeline:
             self.logger.error(f"Error loading data to database: {str(e)}")
             return False
 
+    def _prepare_target_table(self, df, table_name, mode):
+        """Create or empty the target table in place and align df to its columns
+
+        Existing tables are truncated rather than dropped, since views such as
+        mv_sales_daily depend on them. Returns the aligned frame and whether
+        the table was just created.
+        """
+        inspector = inspect(self.db_engine)
+        if not inspector.has_table(table_name):
+            df.head(0).to_sql(table_name, self.db_engine, index=False)
+            return df, True
+
+        if mode == 'replace':
+            quoted = self.db_engine.dialect.identifier_preparer.quote(table_name)
+            statement = 'TRUNCATE TABLE' if self.db_engine.dialect.name == 'postgresql' else 'DELETE FROM'
+            with self.db_engine.begin() as connection:
+                connection.execute(text(f"{statement} {quoted}"))
+
+        # Generated columns such as drugs.stock_value are computed by the database
+        table_columns = {
+            col['name'] for col in inspector.get_columns(table_name) if 'computed' not in col
+        }
+        skipped = [col for col in df.columns if col not in table_columns]
+        if skipped:
+            self.logger.info(f"Skipping columns not in {table_name}: {', '.join(skipped)}")
+        return df[[col for col in df.columns if col in table_columns]], False
+
+    def _copy_frame(self, cursor, df, table_name):
+        """COPY a DataFrame's rows into a PostgreSQL table on the given cursor"""
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        quote = self.db_engine.dialect.identifier_preparer.quote
+        columns = ', '.join(quote(str(col)) for col in df.columns)
+        cursor.copy_expert(f"COPY {quote(table_name)} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    def _copy_to_table(self, df, table_name):
+        """Stream a DataFrame into a PostgreSQL table with a single COPY"""
+        raw_connection = self.db_engine.raw_connection()
+        try:
+            with raw_connection.cursor() as cursor:
+                self._copy_frame(cursor, df, table_name)
+            raw_connection.commit()
+        finally:
+            raw_connection.close()
+
+    def _upsert_into_table(self, df, table_name, key):
+        """COPY into a staging table, then merge it into table_name on key
+
+        Rows already present are updated in place, so re-running a load is
+        idempotent and rows other tables reference keep their ids.
+        """
+        quote = self.db_engine.dialect.identifier_preparer.quote
+        staging = f"{table_name}_staging"
+        columns = ', '.join(quote(str(col)) for col in df.columns)
+        updates = ', '.join(
+            f"{quote(str(col))} = EXCLUDED.{quote(str(col))}" for col in df.columns if col != key
+        )
+        conflict_action = f"DO UPDATE SET {updates}" if updates else 'DO NOTHING'
+
+        raw_connection = self.db_engine.raw_connection()
+        try:
+            with raw_connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE TEMP TABLE {quote(staging)} ON COMMIT DROP AS "
+                    f"SELECT {columns} FROM {quote(table_name)} WITH NO DATA"
+                )
+                self._copy_frame(cursor, df, staging)
+                # A key repeated within the file would hit the same row twice
+                cursor.execute(
+                    f"INSERT INTO {quote(table_name)} ({columns}) "
+                    f"SELECT DISTINCT ON ({quote(key)}) {columns} FROM {quote(staging)} "
+                    f"ORDER BY {quote(key)} "
+                    f"ON CONFLICT ({quote(key)}) {conflict_action}"
+                )
+            raw_connection.commit()
+        finally:
+            raw_connection.close()
+
+    def refresh_sales_views(self):
+        """Refresh the materialized sales rollups used by the dashboard"""
+        try:
+            with self.db_engine.begin() as connection:
+                refresh_sales_daily(connection)
+            self.logger.info('Refreshed mv_sales_daily')
+            return True
+
+        except Exception as e:  # noqa: BLE001
+            self.logger.error(f"Error refreshing sales views: {str(e)}")
+            return False
+
     def run_etl_pipeline(self, data_type, source_file=None):
         """Run complete ETL pipeline for specific data type"""
         self.stats['start_time'] = datetime.now()
@@ -450,12 +602,17 @@ class PharmaDataPipeline:
                     )
                     self.stats['warnings'] += 1
 
-            success = self.load_to_database(df_transformed, data_type)
+            # Upsert so re-running a file neither duplicates rows nor drops rows
+            # that sales and prescriptions reference
+            success = self.load_to_database(df_transformed, data_type, mode='upsert')
 
             if success:
                 if self.config['processing']['backup_raw_data']:
                     self._archive_raw_data(df_raw, data_type)
 
+                if data_type == 'sales':
+                    self.refresh_sales_views()
+
                 self.stats['files_processed'] += 1
                 self.logger.info(
                     f"ETL pipeline completed successfully for {data_type}"
@@ -476,10 +633,18 @@ class PharmaDataPipeline:
         """Archive raw data for audit purposes"""
         archive_path = self.config['output']['archive_path']
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{data_type}_raw_{timestamp}.csv"
-
         os.makedirs(archive_path, exist_ok=True)
-        df.to_csv(os.path.join(archive_path, filename), index=False)
+
+        if pa is None:
+            filename = f"{data_type}_raw_{timestamp}.csv"
+            self.write_csv(df, os.path.join(archive_path, filename))
+        else:
+            # Compressed columnar archive; smaller and faster to write than text
+            filename = f"{data_type}_raw_{timestamp}.parquet"
+            df.to_parquet(
+                os.path.join(archive_path, filename),
+                engine='pyarrow', compression='zstd', compression_level=3, index=False
+            )
         self.logger.info(f"Raw data archived: {filename}")
 
     def _save_pipeline_stats(self):
@@ -493,12 +658,33 @@ class PharmaDataPipeline:
             f"{datetime.now().strftime('%Y%m%d')}.json"
         )
         os.makedirs(os.path.dirname(stats_file), exist_ok=True)
-
-        with open(stats_file, 'w') as f:
-            json.dump(self.stats, f, indent=2, default=str)
+        self._write_json(stats_file, self.stats)
 
         self.logger.info(f"Pipeline statistics saved: {stats_file}")
 
+    def _write_json(self, file_path, payload):
+        """Write a report or statistics payload as indented JSON"""
+        with open(file_path, 'wb') as f:
+            f.write(orjson.dumps(
+                payload, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+            ))
+
+    def read_csv(self, file_path):
+        """Read a CSV file, using pyarrow's multithreaded parser when installed"""
+        engine = 'c' if pa is None else 'pyarrow'
+        try:
+            return pd.read_csv(file_path, encoding='utf-8', engine=engine)
+        except (UnicodeDecodeError, ValueError):
+            # pyarrow reports invalid UTF-8 as ArrowInvalid, a ValueError
+            return pd.read_csv(file_path, encoding='latin-1', engine=engine)
+
+    def write_csv(self, df, output_file):
+        """Write a DataFrame to CSV, using pyarrow's C++ writer when installed"""
+        if pa is None:
+            df.to_csv(output_file, index=False)
+        else:
+            pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), output_file)
+
     def generate_sample_data(self, data_type, num_records=100):
         """Generate sample data for testing"""
         self.logger.info(f"Generating {num_records} sample {data_type} records")
@@ -517,30 +703,35 @@ class PharmaDataPipeline:
         categories = ['Prescription', 'OTC', 'Controlled', 'Herbal']
         drug_classes = ['Antibiotic', 'Analgesic', 'Antihypertensive', 'Antidiabetic', 'NSAID', 'Antidepressant']
 
-        drugs = []
-        for i in range(num_records):
-            drug = {
-                'drug_code': f"DRG{1000 + i:04d}",
-                'drug_name': f"{self.faker.word().capitalize()} {self.faker.word().capitalize()}",
-                'generic_name': f"Generic {i + 1}",
-                'manufacturer': np.random.choice(manufacturers),
-                'drug_class': np.random.choice(drug_classes),
-                'category': np.random.choice(categories),
-                'unit_price': round(np.random.uniform(5, 150), 2),
-                'cost_price': round(np.random.uniform(3, 100), 2),
-                'stock_quantity': np.random.randint(0, 1000),
-                'min_stock_level': np.random.randint(10, 50),
-                'max_stock_level': np.random.randint(500, 2000),
-                'expiry_date': (
-                    date.today() + timedelta(days=np.random.randint(30, 1095))
-                ).isoformat(),
-                'storage_conditions': np.random.choice(
-                    ['Room Temperature', 'Refrigerated', 'Frozen', 'Protected from Light']
+        today = np.datetime64(date.today(), 'D')
+        ids = np.arange(num_records)
+
+        # Build each column as a whole array rather than row dicts
+        rng = np.random.default_rng()
+        return pd.DataFrame(
+            {
+                'drug_code': 'DRG' + pd.Series(1000 + ids).astype(str),
+                'drug_name': [
+                    f"{self.faker.word().capitalize()} {self.faker.word().capitalize()}"
+                    for _ in range(num_records)
+                ],
+                'generic_name': 'Generic ' + pd.Series(ids + 1).astype(str),
+                'manufacturer': rng.choice(manufacturers, num_records),
+                'drug_class': rng.choice(drug_classes, num_records),
+                'category': rng.choice(categories, num_records),
+                'unit_price': np.round(rng.uniform(5, 150, num_records), 2),
+                'cost_price': np.round(rng.uniform(3, 100, num_records), 2),
+                'stock_quantity': rng.integers(0, 1000, num_records),
+                'min_stock_level': rng.integers(10, 50, num_records),
+                'max_stock_level': rng.integers(500, 2000, num_records),
+                'expiry_date': np.datetime_as_string(
+                    today + rng.integers(30, 1095, num_records).astype('timedelta64[D]'), unit='D'
+                ),
+                'storage_conditions': rng.choice(
+                    ['Room Temperature', 'Refrigerated', 'Frozen', 'Protected from Light'], num_records
                 ),
             }
-            drugs.append(drug)
-
-        return pd.DataFrame(drugs)
+        )
 
     def _generate_sample_sales(self, num_records):
         """Generate sample sales data"""
@@ -557,42 +748,42 @@ class PharmaDataPipeline:
         pharmacies = ['City Pharmacy', 'Health Plus', 'MediCare', 'Wellness Center', 'QuickCare']
         payment_methods = ['Cash', 'Credit Card', 'Insurance', 'Digital']
 
-        sales = []
-        start_date = date.today() - timedelta(days=90)
-
-        for i in range(num_records):
-            drug_id = np.random.choice(drug_ids)
-            quantity = np.random.randint(1, 20)
-            unit_price = drug_prices.get(drug_id, np.random.uniform(10, 100))
-            discount = (
-                round(np.random.uniform(0, unit_price * 0.2), 2)
-                if np.random.random() > 0.7
-                else 0
-            )
-            tax_rate = 0.08
+        start_date = np.datetime64(date.today() - timedelta(days=90), 'D')
+        tax_rate = 0.08
+
+        # Draw every column as a whole array and do the money math element-wise
+        rng = np.random.default_rng()
+        drug_index = rng.integers(0, len(drug_ids), num_records)
+        drug_id = np.asarray(drug_ids)[drug_index]
+        unit_price = np.asarray([drug_prices[d] for d in drug_ids], dtype=float)[drug_index]
+        quantity = rng.integers(1, 20, num_records)
+        discount = np.where(
+            rng.random(num_records) > 0.7,
+            np.round(rng.uniform(0, unit_price * 0.2), 2),
+            0.0,
+        )
 
-            subtotal = unit_price * quantity
-            tax_amount = (subtotal - discount) * tax_rate
-            total_amount = subtotal - discount + tax_amount
+        subtotal = unit_price * quantity
+        tax_amount = (subtotal - discount) * tax_rate
+        total_amount = subtotal - discount + tax_amount
 
-            sale = {
-                'transaction_id': f"SALE-{(10000 + i):05d}",
+        return pd.DataFrame(
+            {
+                'transaction_id': 'SALE-' + pd.Series(np.arange(10000, 10000 + num_records)).astype(str),
                 'drug_id': drug_id,
-                'sale_date': (
-                    start_date + timedelta(days=np.random.randint(0, 90))
-                ).isoformat(),
+                'sale_date': np.datetime_as_string(
+                    start_date + rng.integers(0, 90, num_records).astype('timedelta64[D]'), unit='D'
+                ),
                 'quantity': quantity,
-                'unit_price': round(unit_price, 2),
+                'unit_price': np.round(unit_price, 2),
                 'discount': discount,
-                'tax_amount': round(tax_amount, 2),
-                'total_amount': round(total_amount, 2),
-                'pharmacy_id': np.random.randint(100, 110),
-                'pharmacy_name': np.random.choice(pharmacies),
-                'payment_method': np.random.choice(payment_methods),
+                'tax_amount': np.round(tax_amount, 2),
+                'total_amount': np.round(total_amount, 2),
+                'pharmacy_id': rng.integers(100, 110, num_records),
+                'pharmacy_name': rng.choice(pharmacies, num_records),
+                'payment_method': rng.choice(payment_methods, num_records),
             }
-            sales.append(sale)
-
-        return pd.DataFrame(sales)
+        )
 
     def _generate_sample_patients(self, num_records):
         """Generate sample patient data"""
@@ -621,30 +812,45 @@ class PharmaDataPipeline:
             'San Jose',
         ]
 
-        patients = []
-        for i in range(num_records):
-            dob = self.faker.date_of_birth(minimum_age=18, maximum_age=90)
-            age = (date.today() - dob).days // 365
-
-            patient = {
-                'patient_code': f"PAT{(1000 + i):04d}",
-                'first_name': self.faker.first_name(),
-                'last_name': self.faker.last_name(),
-                'date_of_birth': dob.isoformat(),
-                'age': age,
-                'gender': np.random.choice(['Male', 'Female', 'Other']),
-                'email': self.faker.email(),
-                'phone': self.faker.phone_number(),
-                'address': self.faker.address().replace('\n', ', '),
-                'city': np.random.choice(cities),
-                'state': self.faker.state_abbr(),
-                'zip_code': self.faker.zipcode(),
-                'primary_condition': np.random.choice(conditions),
-                'insurance_id': f"INS{np.random.randint(10000, 99999)}",
+        today = np.datetime64(date.today(), 'D')
+
+        # Build each column as a whole array rather than row dicts
+        rng = np.random.default_rng()
+        age_days = rng.integers(18 * 365, 90 * 365, num_records)
+        return pd.DataFrame(
+            {
+                'patient_code': 'PAT' + pd.Series(np.arange(1000, 1000 + num_records)).astype(str),
+                'first_name': rng.choice(self._faker_pool('first_name'), num_records),
+                'last_name': rng.choice(self._faker_pool('last_name'), num_records),
+                'date_of_birth': np.datetime_as_string(today - age_days.astype('timedelta64[D]'), unit='D'),
+                'age': age_days // 365,
+                'gender': rng.choice(['Male', 'Female', 'Other'], num_records),
+                'email': rng.choice(self._faker_pool('email'), num_records),
+                'phone': rng.choice(self._faker_pool('phone_number'), num_records),
+                'address': np.char.replace(rng.choice(self._faker_pool('address'), num_records), '\n', ', '),
+                'city': rng.choice(cities, num_records),
+                'state': rng.choice(self._faker_pool('state_abbr'), num_records),
+                'zip_code': rng.choice(self._faker_pool('zipcode'), num_records),
+                'primary_condition': rng.choice(conditions, num_records),
+                'insurance_id': 'INS' + pd.Series(rng.integers(10000, 99999, num_records)).astype(str),
             }
-            patients.append(patient)
+        )
 
-        return pd.DataFrame(patients)
+    def _merge_stats(self, stats):
+        """Fold statistics from a worker process's pipeline run into this pipeline's"""
+        for key in ['files_processed', 'records_processed', 'errors', 'warnings']:
+            self.stats[key] += stats[key]
+        if self.stats['start_time'] is None or stats['start_time'] < self.stats['start_time']:
+            self.stats['start_time'] = stats['start_time']
+        if self.stats['end_time'] is None or stats['end_time'] > self.stats['end_time']:
+            self.stats['end_time'] = stats['end_time']
+
+    def _faker_pool(self, provider, size=1024):
+        """Pre-generated values of a Faker provider, sampled instead of calling Faker per row"""
+        if provider not in self._faker_pools:
+            generate = getattr(self.faker, provider)
+            self._faker_pools[provider] = [generate() for _ in range(size)]
+        return self._faker_pools[provider]
 
     def run_daily_pipeline(self):
         """Run complete daily data pipeline"""
@@ -655,33 +861,61 @@ class PharmaDataPipeline:
 
         data_types = ['drugs', 'sales', 'patients']
         results = {}
+        jobs = []
 
         for data_type in data_types:
             source_file = self.config['data_sources'].get(data_type)
             if source_file and os.path.exists(source_file):
                 self.logger.info(f"Processing {data_type} from {source_file}")
-                success = self.run_etl_pipeline(data_type, source_file)
-                results[data_type] = 'Success' if success else 'Failed'
+                jobs.append((data_type, source_file))
             else:
                 self.logger.warning(
                     f"Source file not found for {data_type}: {source_file}"
                 )
                 results[data_type] = 'Skipped'
 
+        if jobs:
+            # sales.drug_id references drugs, so drugs load to completion first;
+            # sales and patients do not reference each other and then run side
+            # by side on their own cores
+            waves = [
+                [job for job in jobs if job[0] == 'drugs'],
+                [job for job in jobs if job[0] != 'drugs'],
+            ]
+            with ProcessPoolExecutor(max_workers=max(len(wave) for wave in waves)) as executor:
+                for wave in waves:
+                    futures = {
+                        executor.submit(_run_etl_in_process, self.config_path, data_type, source_file): data_type
+                        for data_type, source_file in wave
+                    }
+                    for future in as_completed(futures):
+                        success, stats = future.result()
+                        results[futures[future]] = 'Success' if success else 'Failed'
+                        self._merge_stats(stats)
+            self._save_pipeline_stats()
+            results = {data_type: results[data_type] for data_type in data_types}
+
+        now = datetime.now()
         summary = {
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
             'results': results,
             'statistics': self.stats,
         }
 
         summary_file = (
             f"{self.config['output']['reports_path']}daily_pipeline_summary_"
-            f"{datetime.now().strftime('%Y%m%d')}.json"
+            f"{now.strftime('%Y%m%d')}.json"
         )
-        with open(summary_file, 'w') as f:
-            json.dump(summary, f, indent=2, default=str)
+        self._write_json(summary_file, summary)
 
         self.logger.info(
             f"Daily pipeline completed. Summary: {summary_file}"
         )
         return results
+
+
+def _run_etl_in_process(config_path, data_type, source_file):
+    """Run one data type's ETL with a pipeline (and engine) owned by the worker process"""
+    pipeline = PharmaDataPipeline(config_path)
+    success = pipeline.run_etl_pipeline(data_type, source_file)
+    return success, pipeline.stats
@@ -1,21 +1,45 @@
-import json
 import logging
-from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from pathlib import Path
 
-import numpy as np
-import pandas as pd
-from sqlalchemy import func
+import orjson
+from flask import has_app_context
+from sqlalchemy import and_, case, delete, exists, func, select, true, update
 
-from app import db
+from app import cache, db
 from app.models.drug import Drug
 from app.models.patient import Patient
 from app.models.sale import Sale
 
+QUALITY_METRICS_CACHE_KEY = 'data_quality_metrics'
+QUALITY_METRICS_CACHE_SECONDS = 300
+
+# Report files are written off the request/scheduler thread; one worker keeps them ordered
+_report_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='quality-report')
+
 
 class DataQualityMonitor:
     """Monitor and maintain data quality across the system"""
 
+    # Columns a row must have filled in to count as complete, per table
+    REQUIRED_FIELDS = {
+        'drugs': (Drug, [Drug.drug_code, Drug.drug_name, Drug.manufacturer, Drug.unit_price]),
+        'sales': (Sale, [Sale.transaction_id, Sale.drug_id, Sale.sale_date, Sale.total_amount]),
+        'patients': (Patient, [Patient.first_name, Patient.last_name, Patient.date_of_birth]),
+    }
+
+    # (metric key, rule, model, violating-row condition) for the accuracy check
+    ACCURACY_RULES = [
+        ('invalid_prices', 'Unit price must be positive', Drug, Drug.unit_price <= 0),
+        ('invalid_quantities', 'Sale quantity must be positive', Sale, Sale.quantity <= 0),
+        ('invalid_ages', 'Patient age must be between 0 and 120', Patient, (Patient.age < 0) | (Patient.age > 120)),
+        (
+            'invalid_discounts', 'Discount cannot exceed sale amount',
+            Sale, Sale.discount > (Sale.unit_price * Sale.quantity)
+        ),
+    ]
+
     def __init__(self):
         self.logger = logging.getLogger('data_quality')
 
@@ -23,38 +47,27 @@ class DataQualityMonitor:
         """Check data completeness for a table"""
         self.logger.info(f"Checking completeness for {table_name}")
 
-        if table_name == 'drugs':
-            total = Drug.query.count()
-            complete = (
-                Drug.query.filter(
-                    Drug.drug_code.isnot(None),
-                    Drug.drug_name.isnot(None),
-                    Drug.manufacturer.isnot(None),
-                    Drug.unit_price.isnot(None),
-                ).count()
-            )
-        elif table_name == 'sales':
-            total = Sale.query.count()
-            complete = (
-                Sale.query.filter(
-                    Sale.transaction_id.isnot(None),
-                    Sale.drug_id.isnot(None),
-                    Sale.sale_date.isnot(None),
-                    Sale.total_amount.isnot(None),
-                ).count()
-            )
-        elif table_name == 'patients':
-            total = Patient.query.count()
-            complete = (
-                Patient.query.filter(
-                    Patient.first_name.isnot(None),
-                    Patient.last_name.isnot(None),
-                    Patient.date_of_birth.isnot(None),
-                ).count()
-            )
-        else:
+        if table_name not in self.REQUIRED_FIELDS:
             return {'error': f'Unknown table: {table_name}'}
 
+        return self._completeness_report(
+            table_name, self._fetch(self._completeness_query(table_name)), datetime.now()
+        )
+
+    def _completeness_query(self, table_name):
+        """Total and complete rows of a table, counted in one scan"""
+        model, fields = self.REQUIRED_FIELDS[table_name]
+        return select(
+            func.count().label(f'{table_name}_total'),
+            func.count(case((and_(*(field.isnot(None) for field in fields)), 1))).label(
+                f'{table_name}_complete'
+            ),
+        ).select_from(model)
+
+    def _completeness_report(self, table_name, metrics, now):
+        """Build the completeness check result from fetched metrics"""
+        total = metrics[f'{table_name}_total']
+        complete = metrics[f'{table_name}_complete']
         completeness_rate = (complete / total * 100) if total > 0 else 0
 
         return {
@@ -62,132 +75,136 @@ class DataQualityMonitor:
             'total_records': total,
             'complete_records': complete,
             'completeness_rate': round(completeness_rate, 2),
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
         }
 
     def check_consistency(self):
         """Check data consistency across tables"""
         self.logger.info('Checking data consistency')
-
-        orphaned_sales = (
-            db.session.query(Sale)
-            .filter(~Sale.drug_id.in_(db.session.query(Drug.id)))
-            .count()
-        )
-
-        negative_stock = Drug.query.filter(Drug.stock_quantity < 0).count()
-
-        future_sales = Sale.query.filter(Sale.sale_date > date.today()).count()
-
-        expired_drugs = (
-            Drug.query.filter(
-                Drug.expiry_date < date.today(), Drug.stock_quantity > 0
-            ).count()
-        )
-
+        now = datetime.now()
+        return self._consistency_report(self._fetch(*self._consistency_queries(now.date())), now)
+
+    def _consistency_queries(self, today):
+        """Consistency counts, one aggregate per table"""
+        return [
+            # Left join to drugs so orphans are found with a hash anti-join
+            select(
+                func.count(case((Drug.id.is_(None), 1))).label('orphaned_sales'),
+                func.count(case((Sale.sale_date > today, 1))).label('future_sales'),
+            ).select_from(Sale).outerjoin(Drug, Sale.drug_id == Drug.id),
+            select(
+                func.count(case((Drug.stock_quantity < 0, 1))).label('negative_stock'),
+                func.count(
+                    case((and_(Drug.expiry_date < today, Drug.stock_quantity > 0), 1))
+                ).label('expired_drugs_in_stock'),
+            ).select_from(Drug),
+        ]
+
+    def _consistency_report(self, metrics, now):
+        """Build the consistency check result from fetched metrics"""
         return {
-            'orphaned_sales': orphaned_sales,
-            'negative_stock': negative_stock,
-            'future_sales': future_sales,
-            'expired_drugs_in_stock': expired_drugs,
-            'timestamp': datetime.now().isoformat(),
+            'orphaned_sales': metrics['orphaned_sales'],
+            'negative_stock': metrics['negative_stock'],
+            'future_sales': metrics['future_sales'],
+            'expired_drugs_in_stock': metrics['expired_drugs_in_stock'],
+            'timestamp': now.isoformat(),
         }
 
     def check_accuracy(self):
         """Check data accuracy through business rules"""
         self.logger.info('Checking data accuracy')
-
+        return self._accuracy_report(self._fetch(*self._accuracy_queries()), datetime.now())
+
+    def _accuracy_queries(self):
+        """Violation count and lowest violating id for each rule, one aggregate per table"""
+        columns = {}
+        for key, _, model, condition in self.ACCURACY_RULES:
+            columns.setdefault(model, []).extend([
+                func.count(case((condition, 1))).label(f'{key}_violations'),
+                func.min(case((condition, model.id))).label(f'{key}_example'),
+            ])
+        return [select(*model_columns).select_from(model) for model, model_columns in columns.items()]
+
+    def _accuracy_report(self, metrics, now):
+        """Build the accuracy check result from fetched metrics"""
         issues = []
-
-        invalid_prices = Drug.query.filter(Drug.unit_price <= 0).all()
-        if invalid_prices:
-            issues.append(
-                {
-                    'rule': 'Unit price must be positive',
-                    'violations': len(invalid_prices),
-                    'example': f"Drug ID: {invalid_prices[0].id}" if invalid_prices else None,
-                }
-            )
-
-        invalid_quantities = Sale.query.filter(Sale.quantity <= 0).all()
-        if invalid_quantities:
-            issues.append(
-                {
-                    'rule': 'Sale quantity must be positive',
-                    'violations': len(invalid_quantities),
-                    'example': f"Sale ID: {invalid_quantities[0].id}" if invalid_quantities else None,
-                }
-            )
-
-        invalid_ages = Patient.query.filter(
-            (Patient.age < 0) | (Patient.age > 120)
-        ).all()
-        if invalid_ages:
-            issues.append(
-                {
-                    'rule': 'Patient age must be between 0 and 120',
-                    'violations': len(invalid_ages),
-                    'example': f"Patient ID: {invalid_ages[0].id}" if invalid_ages else None,
-                }
-            )
-
-        invalid_discounts = Sale.query.filter(
-            Sale.discount > (Sale.unit_price * Sale.quantity)
-        ).all()
-        if invalid_discounts:
-            issues.append(
-                {
-                    'rule': 'Discount cannot exceed sale amount',
-                    'violations': len(invalid_discounts),
-                    'example': f"Sale ID: {invalid_discounts[0].id}" if invalid_discounts else None,
-                }
-            )
+        for key, rule, model, _ in self.ACCURACY_RULES:
+            if metrics[f'{key}_violations']:
+                issues.append(
+                    {
+                        'rule': rule,
+                        'violations': metrics[f'{key}_violations'],
+                        'example': f"{model.__name__} ID: {metrics[f'{key}_example']}",
+                    }
+                )
 
         return {
             'total_issues': len(issues),
             'issues': issues,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
         }
 
     def check_timeliness(self):
         """Check data timeliness (how up-to-date is the data)"""
         self.logger.info('Checking data timeliness')
-
-        last_sale = Sale.query.order_by(Sale.sale_date.desc()).first()
-        last_sale_date = last_sale.sale_date if last_sale else None
+        now = datetime.now()
+        return self._timeliness_report(self._fetch(*self._timeliness_queries(now.date())), now)
+
+    def _timeliness_queries(self, today):
+        """Latest sale date and last week's activity, one aggregate per table"""
+        week_ago = today - timedelta(days=7)
+        return [
+            select(
+                func.max(Sale.sale_date).label('last_sale_date'),
+                func.count(case((Sale.sale_date >= week_ago, 1))).label('recent_sales'),
+            ).select_from(Sale),
+            select(
+                func.count(case((Patient.created_at >= week_ago, 1))).label('recent_patients'),
+            ).select_from(Patient),
+        ]
+
+    def _timeliness_report(self, metrics, now):
+        """Build the timeliness check result from fetched metrics"""
+        last_sale_date = metrics['last_sale_date']
 
         if last_sale_date:
-            days_since_last_sale = (date.today() - last_sale_date).days
+            days_since_last_sale = (now.date() - last_sale_date).days
         else:
             days_since_last_sale = None
 
-        week_ago = date.today() - pd.Timedelta(days=7)
-        recent_sales = Sale.query.filter(Sale.sale_date >= week_ago).count()
-        recent_patients = Patient.query.filter(
-            Patient.created_at >= week_ago
-        ).count()
-
         return {
             'last_sale_date': last_sale_date.isoformat() if last_sale_date else None,
             'days_since_last_sale': days_since_last_sale,
-            'recent_sales_7_days': recent_sales,
-            'recent_patients_7_days': recent_patients,
-            'timestamp': datetime.now().isoformat(),
+            'recent_sales_7_days': metrics['recent_sales'],
+            'recent_patients_7_days': metrics['recent_patients'],
+            'timestamp': now.isoformat(),
         }
 
-    def run_comprehensive_quality_check(self):
+    def _fetch(self, *queries):
+        """Run single-row aggregate queries as one statement and return the combined row"""
+        subqueries = [query.subquery() for query in queries]
+        statement = select(*subqueries).select_from(subqueries[0])
+        for subquery in subqueries[1:]:
+            statement = statement.join(subquery, true())
+        return db.session.execute(statement).one()._mapping
+
+    def run_comprehensive_quality_check(self, force_refresh=False):
         """Run all quality checks and generate report"""
         self.logger.info('Running comprehensive data quality check')
 
-        report = {'execution_time': datetime.now().isoformat(), 'checks': {}}
+        # One clock reading for every filter and timestamp in the run
+        now = datetime.now()
+        report = {'execution_time': now.isoformat(), 'checks': {}}
 
         tables = ['drugs', 'sales', 'patients']
+        metrics = self._comprehensive_metrics(tables, now.date(), force_refresh)
+
         for table in tables:
-            report['checks'][f'completeness_{table}'] = self.check_completeness(table)
+            report['checks'][f'completeness_{table}'] = self._completeness_report(table, metrics, now)
 
-        report['checks']['consistency'] = self.check_consistency()
-        report['checks']['accuracy'] = self.check_accuracy()
-        report['checks']['timeliness'] = self.check_timeliness()
+        report['checks']['consistency'] = self._consistency_report(metrics, now)
+        report['checks']['accuracy'] = self._accuracy_report(metrics, now)
+        report['checks']['timeliness'] = self._timeliness_report(metrics, now)
 
         completeness_scores = []
         for table in tables:
@@ -196,7 +213,9 @@ class DataQualityMonitor:
             )
             completeness_scores.append(score)
 
-        avg_completeness = np.mean(completeness_scores) if completeness_scores else 0
+        avg_completeness = (
+            sum(completeness_scores) / len(completeness_scores) if completeness_scores else 0
+        )
 
         consistency_score = 100
         consistency_issues = report['checks']['consistency']
@@ -234,6 +253,29 @@ class DataQualityMonitor:
 
         return report
 
+    def _comprehensive_metrics(self, tables, today, force_refresh=False):
+        """Every check's metrics in a single round-trip, reused for a few minutes unless refreshed"""
+        cache_key = self._metrics_cache_key(today)
+        metrics = None if force_refresh else cache.get(cache_key)
+        if metrics is None:
+            metrics = dict(self._fetch(
+                *(self._completeness_query(table) for table in tables),
+                *self._consistency_queries(today),
+                *self._accuracy_queries(),
+                *self._timeliness_queries(today),
+            ))
+            cache.set(cache_key, metrics, timeout=QUALITY_METRICS_CACHE_SECONDS)
+        return metrics
+
+    def _metrics_cache_key(self, today):
+        """Cache key for the comprehensive metrics; date-scoped since the filters depend on today"""
+        return f'{QUALITY_METRICS_CACHE_KEY}:{today.isoformat()}'
+
+    def invalidate_cached_metrics(self):
+        """Drop cached quality metrics after the underlying data has been reloaded or fixed"""
+        if has_app_context():
+            cache.delete(self._metrics_cache_key(datetime.now().date()))
+
     def _get_quality_grade(self, score):
         """Convert score to letter grade"""
         if score >= 90:
@@ -248,31 +290,46 @@ class DataQualityMonitor:
 
     def _save_quality_report(self, report):
         """Save quality report to file"""
-        reports_dir = Path('reports/quality')
-        reports_dir.mkdir(exist_ok=True)
-
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        report_file = reports_dir / f'quality_report_{timestamp}.json'
+        report_file = Path('reports/quality') / f'quality_report_{timestamp}.json'
 
-        with open(report_file, 'w') as f:
-            json.dump(report, f, indent=2, default=str)
+        # Serialize now so later changes to report cannot race the write; write off-thread
+        data = orjson.dumps(report, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+        _report_writer.submit(self._write_report_file, report_file, data)
 
-        self.logger.info(f"Quality report saved: {report_file}")
+    def _write_report_file(self, report_file, data):
+        """Write a serialized quality report on the report writer thread"""
+        try:
+            report_file.parent.mkdir(parents=True, exist_ok=True)
+            report_file.write_bytes(data)
+            self.logger.info(f"Quality report saved: {report_file}")
+        except OSError as e:
+            self.logger.error(f"Error saving quality report: {str(e)}")
 
     def fix_data_issues(self):
         """Attempt to automatically fix common data issues"""
         self.logger.info('Attempting to fix data issues')
+        now = datetime.now()
+        today = now.date()
 
         fixes_applied = []
 
-        negative_stock_drugs = Drug.query.filter(Drug.stock_quantity < 0).all()
-        for drug in negative_stock_drugs:
-            old_value = drug.stock_quantity
-            drug.stock_quantity = 0
+        # Each fix is one server-side statement; RETURNING reports what it changed
+        drugs = Drug.__table__
+        negative_stock = (
+            select(drugs.c.id, drugs.c.stock_quantity).where(drugs.c.stock_quantity < 0).subquery()
+        )
+        zeroed_drugs = db.session.execute(
+            update(drugs)
+            .where(drugs.c.id == negative_stock.c.id)
+            .values(stock_quantity=0)
+            .returning(drugs.c.id, negative_stock.c.stock_quantity)
+        ).all()
+        for drug_id, old_value in zeroed_drugs:
             fixes_applied.append(
                 {
                     'table': 'drugs',
-                    'id': drug.id,
+                    'id': drug_id,
                     'field': 'stock_quantity',
                     'old_value': old_value,
                     'new_value': 0,
@@ -280,15 +337,17 @@ class DataQualityMonitor:
                 }
             )
 
-        orphaned_sales = db.session.query(Sale).filter(
-            ~Sale.drug_id.in_(db.session.query(Drug.id))
-        ).all()
-        for sale in orphaned_sales:
-            db.session.delete(sale)
+        sales = Sale.__table__
+        orphaned_sale_ids = db.session.execute(
+            delete(sales)
+            .where(~exists().where(drugs.c.id == sales.c.drug_id))
+            .returning(sales.c.id)
+        ).scalars().all()
+        for sale_id in orphaned_sale_ids:
             fixes_applied.append(
                 {
                     'table': 'sales',
-                    'id': sale.id,
+                    'id': sale_id,
                     'field': 'all',
                     'old_value': 'Exists',
                     'new_value': 'Deleted',
@@ -296,27 +355,32 @@ class DataQualityMonitor:
                 }
             )
 
-        future_sales = Sale.query.filter(Sale.sale_date > date.today()).all()
-        for sale in future_sales:
-            old_date = sale.sale_date
-            sale.sale_date = date.today()
+        future_sales = select(sales.c.id, sales.c.sale_date).where(sales.c.sale_date > today).subquery()
+        redated_sales = db.session.execute(
+            update(sales)
+            .where(sales.c.id == future_sales.c.id)
+            .values(sale_date=today)
+            .returning(sales.c.id, future_sales.c.sale_date)
+        ).all()
+        for sale_id, old_date in redated_sales:
             fixes_applied.append(
                 {
                     'table': 'sales',
-                    'id': sale.id,
+                    'id': sale_id,
                     'field': 'sale_date',
                     'old_value': old_date.isoformat(),
-                    'new_value': date.today().isoformat(),
+                    'new_value': today.isoformat(),
                     'fix_type': 'Future date correction',
                 }
             )
 
         if fixes_applied:
             db.session.commit()
+            self.invalidate_cached_metrics()
             self.logger.info(f"Applied {len(fixes_applied)} fixes")
 
         return {
             'fixes_applied': len(fixes_applied),
             'details': fixes_applied,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': now.isoformat(),
         }
@@ -0,0 +1,60 @@
+# app/session.py
+from functools import wraps
+
+from flask import current_app, g, has_app_context, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.orm import raiseload
+
+REPLICA_BIND = 'replica'
+
+
+class RoutingSession(Session):
+    """Session that sends queries from read-only contexts to the replica bind"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('read_only'):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def mark_read_only():
+    """Route the current app context's queries to the replica and skip autoflush"""
+    from app import db
+
+    g.read_only = True
+    db.session.autoflush = False
+
+
+def request_cached(fn):
+    """Memoize fn by arguments for the rest of the current request; a plain call outside one"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not has_request_context():
+            return fn(*args, **kwargs)
+        cache = g.setdefault('request_cache', {})
+        key = (fn.__qualname__, args, tuple(sorted(kwargs.items())))
+        if key not in cache:
+            cache[key] = fn(*args, **kwargs)
+        return cache[key]
+    return wrapper
+
+
+def mark_strict_loading():
+    """In debug mode, make lazy relationship loads in the current app context raise"""
+    g.strict_loading = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _raise_on_lazy_load(orm_execute_state):
+    """Surface accidental N+1 queries during development instead of silently issuing them"""
+    if (
+        orm_execute_state.is_select
+        and not orm_execute_state.is_relationship_load
+        and has_app_context()
+        and current_app.debug
+        and g.get('strict_loading')
+    ):
+        orm_execute_state.statement = orm_execute_state.statement.options(raiseload('*'))
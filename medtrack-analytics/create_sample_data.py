@@ -12,7 +12,7 @@ if __name__ == '__main__':
     for data_type in ['drugs', 'sales', 'patients']:
         sample_df = pipeline.generate_sample_data(data_type, 1000)
         output_file = f'data/raw/{data_type}_sample.csv'
-        sample_df.to_csv(output_file, index=False)
+        pipeline.write_csv(sample_df, output_file)
         print(f'Generated {len(sample_df)} {data_type} records to {output_file}')
 
     print('\nSample data generation complete!')
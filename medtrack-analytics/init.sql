@@ -1,6 +1,11 @@
 -- init.sql
 -- Create Database Schema for Pharmaceutical Analytics
 
+-- Sequences backing server-assigned patient, prescription and sale codes
+CREATE SEQUENCE IF NOT EXISTS patient_code_seq;
+CREATE SEQUENCE IF NOT EXISTS prescription_code_seq;
+CREATE SEQUENCE IF NOT EXISTS sale_transaction_seq;
+
 -- 1. Drugs Table - Core pharmaceutical products
 CREATE TABLE IF NOT EXISTS drugs (
     drug_id SERIAL PRIMARY KEY,
@@ -13,6 +18,7 @@ CREATE TABLE IF NOT EXISTS drugs (
     unit_price DECIMAL(10,2) NOT NULL CHECK (unit_price > 0),
     cost_price DECIMAL(10,2),
     stock_quantity INT NOT NULL DEFAULT 0,
+    stock_value DECIMAL(14,2) GENERATED ALWAYS AS (unit_price * stock_quantity) STORED,
     min_stock_level INT DEFAULT 10,
     max_stock_level INT DEFAULT 1000,
     expiry_date DATE,
@@ -24,15 +30,15 @@ CREATE TABLE IF NOT EXISTS drugs (
 -- 2. Sales Table - Pharmacy sales transactions
 CREATE TABLE IF NOT EXISTS sales (
     sale_id SERIAL PRIMARY KEY,
-    transaction_id VARCHAR(50) UNIQUE NOT NULL,
+    transaction_id VARCHAR(50) UNIQUE NOT NULL DEFAULT 'SALE-' || to_char(CURRENT_DATE, 'YYYYMMDD') || '-' || lpad(nextval('sale_transaction_seq')::text, 10, '0'),
     drug_id INT REFERENCES drugs(drug_id) ON DELETE RESTRICT,
     sale_date DATE NOT NULL,
     sale_datetime TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     quantity INT NOT NULL CHECK (quantity > 0),
-    unit_price DECIMAL(10,2) NOT NULL,
+    unit_price DECIMAL(10,2) NOT NULL CHECK (unit_price > 0),
     discount DECIMAL(10,2) DEFAULT 0,
     tax_amount DECIMAL(10,2) DEFAULT 0,
-    total_amount DECIMAL(10,2) NOT NULL,
+    total_amount DECIMAL(10,2) NOT NULL CHECK (total_amount > 0),
     pharmacy_id INT NOT NULL,
     pharmacy_name VARCHAR(150),
     salesperson_id INT,
@@ -74,9 +80,10 @@ CREATE TABLE IF NOT EXISTS prescriptions (
     date_dispensed DATE,
     dosage VARCHAR(100) NOT NULL,
     frequency VARCHAR(50) NOT NULL,
-    duration_days INT NOT NULL,
-    refills_allowed INT DEFAULT 0,
-    refills_used INT DEFAULT 0,
+    duration_days INT NOT NULL CHECK (duration_days > 0),
+    expires_at DATE GENERATED ALWAYS AS (date_prescribed + duration_days) STORED,
+    refills_allowed INT DEFAULT 0 CHECK (refills_allowed >= 0),
+    refills_used INT DEFAULT 0 CHECK (refills_used >= 0),
     status VARCHAR(20) CHECK (status IN ('Active', 'Completed', 'Cancelled', 'Expired')),
     notes TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
@@ -129,24 +136,45 @@ CREATE TABLE IF NOT EXISTS data_quality_logs (
 );
 
 -- Indexes
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 CREATE INDEX IF NOT EXISTS idx_drug_name ON drugs (drug_name);
 CREATE INDEX IF NOT EXISTS idx_manufacturer ON drugs (manufacturer);
 CREATE INDEX IF NOT EXISTS idx_category ON drugs (category);
-CREATE INDEX IF NOT EXISTS idx_expiry_date ON drugs (expiry_date);
+CREATE INDEX IF NOT EXISTS idx_expiry_date ON drugs (expiry_date) WHERE expiry_date IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_restock_ratio ON drugs ((CAST(stock_quantity AS FLOAT) / CAST(NULLIF(min_stock_level, 0) AS FLOAT)));
+CREATE INDEX IF NOT EXISTS idx_restock_no_minimum ON drugs (stock_quantity) WHERE min_stock_level = 0;
+
+CREATE INDEX IF NOT EXISTS idx_drug_name_trgm ON drugs USING gin (drug_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_generic_name_trgm ON drugs USING gin (generic_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_drug_code_trgm ON drugs USING gin (drug_code gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_manufacturer_trgm ON drugs USING gin (manufacturer gin_trgm_ops);
 
 CREATE INDEX IF NOT EXISTS idx_sale_date ON sales (sale_date);
+CREATE INDEX IF NOT EXISTS idx_sale_keyset ON sales (sale_date, COALESCE(sale_datetime, CAST(sale_date AS TIMESTAMP)), sale_id);
 CREATE INDEX IF NOT EXISTS idx_pharmacy_id ON sales (pharmacy_id);
 CREATE INDEX IF NOT EXISTS idx_sale_drug_id ON sales (drug_id);
+CREATE INDEX IF NOT EXISTS idx_sale_drug_date ON sales (drug_id, sale_date);
+CREATE INDEX IF NOT EXISTS idx_sale_date_drug ON sales (sale_date, drug_id) INCLUDE (quantity, total_amount);
+CREATE INDEX IF NOT EXISTS idx_sale_date_pharmacy ON sales (sale_date, pharmacy_id) INCLUDE (pharmacy_name, total_amount, quantity);
 CREATE INDEX IF NOT EXISTS idx_payment_method ON sales (payment_method);
 
-CREATE INDEX IF NOT EXISTS idx_patient_name ON patients (last_name, first_name);
+CREATE INDEX IF NOT EXISTS idx_patient_name ON patients (last_name, first_name, patient_id);
 CREATE INDEX IF NOT EXISTS idx_city_state ON patients (city, state);
 CREATE INDEX IF NOT EXISTS idx_age ON patients (age);
+CREATE INDEX IF NOT EXISTS idx_primary_condition ON patients (primary_condition);
+CREATE INDEX IF NOT EXISTS idx_state ON patients (state);
+CREATE INDEX IF NOT EXISTS idx_first_name_trgm ON patients USING gin (first_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_last_name_trgm ON patients USING gin (last_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_patient_code_trgm ON patients USING gin (patient_code gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_primary_condition_trgm ON patients USING gin (primary_condition gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_city_trgm ON patients USING gin (city gin_trgm_ops);
 
-CREATE INDEX IF NOT EXISTS idx_prescription_patient_id ON prescriptions (patient_id);
+CREATE INDEX IF NOT EXISTS idx_prescription_patient_date ON prescriptions (patient_id, date_prescribed);
 CREATE INDEX IF NOT EXISTS idx_prescription_drug_id ON prescriptions (drug_id);
 CREATE INDEX IF NOT EXISTS idx_date_prescribed ON prescriptions (date_prescribed);
-CREATE INDEX IF NOT EXISTS idx_status ON prescriptions (status);
+CREATE INDEX IF NOT EXISTS idx_prescription_status_date ON prescriptions (status, date_prescribed);
+CREATE INDEX IF NOT EXISTS idx_prescription_active_expiry ON prescriptions (expires_at) WHERE status = 'Active';
 
 CREATE INDEX IF NOT EXISTS idx_inventory_drug_id ON inventory_transactions (drug_id);
 CREATE INDEX IF NOT EXISTS idx_transaction_date ON inventory_transactions (transaction_date);
@@ -199,6 +227,21 @@ FROM sales s
 GROUP BY DATE_TRUNC('month', s.sale_date)
 ORDER BY month DESC;
 
+-- Materialized daily sales rollup for the dashboard
+-- Refresh with: REFRESH MATERIALIZED VIEW CONCURRENTLY mv_sales_daily;
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_sales_daily AS
+SELECT
+    sale_date,
+    drug_id,
+    SUM(total_amount) as revenue,
+    SUM(quantity) as quantity,
+    COUNT(*) as transactions,
+    CURRENT_DATE as refreshed_on
+FROM sales
+GROUP BY sale_date, drug_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_sales_daily ON mv_sales_daily (sale_date, drug_id);
+
 -- Insert sample data
 INSERT INTO drugs (drug_code, drug_name, generic_name, manufacturer, drug_class, category, unit_price, cost_price, stock_quantity, min_stock_level, expiry_date) VALUES
 ('PAN500', 'Panadol Extra', 'Paracetamol 500mg', 'GSK', 'Analgesic', 'OTC', 5.99, 3.50, 150, 50, '2025-12-31'),
@@ -219,3 +262,6 @@ INSERT INTO sales (transaction_id, drug_id, sale_date, quantity, unit_price, dis
 ('SALE003', 3, '2024-01-16', 8, 25.75, 2.00, 19.00, 204.00, 102, 'Health Plus', 'Cash'),
 ('SALE004', 1, '2024-01-17', 15, 5.99, 1.50, 8.24, 97.35, 103, 'MediCare', 'Credit Card'),
 ('SALE005', 4, '2024-01-18', 20, 8.25, 0.00, 16.50, 181.50, 101, 'City Pharmacy', 'Insurance');
+
+-- Populate the rollup with the sample sales
+REFRESH MATERIALIZED VIEW mv_sales_daily;
@@ -16,6 +16,10 @@ fi
 # Install dependencies
 pip install -r requirements.txt
 
+# Create database tables, then bring an existing database up to the models
+flask --app run create-db
+flask --app run upgrade-db
+
 # Run the application
 echo "Starting MedTrack Analytics API..."
 python run.py
@@ -1,15 +1,20 @@
 # test_api.py
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 import requests
 
 BASE_URL = "http://localhost:5000/api"
 
+# Shared keep-alive connections for every test, sized for the concurrent run
+session = requests.Session()
+session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=8))
+
 
 def test_health():
     """Test health endpoint"""
-    response = requests.get(f"{BASE_URL}/health")
+    response = session.get(f"{BASE_URL}/health")
     print("Health Check:", response.status_code, response.json())
     return response.status_code == 200
 
@@ -18,13 +23,13 @@ def test_drug_endpoints():
     """Test drug-related endpoints"""
     print("\n=== Testing Drug Endpoints ===")
 
-    response = requests.get(f"{BASE_URL}/drugs")
+    response = session.get(f"{BASE_URL}/drugs")
     print(f"Get Drugs: {response.status_code}")
 
-    response = requests.get(f"{BASE_URL}/drugs/low-stock")
+    response = session.get(f"{BASE_URL}/drugs/low-stock")
     print(f"Low Stock: {response.status_code}")
 
-    response = requests.get(f"{BASE_URL}/drugs/inventory/value")
+    response = session.get(f"{BASE_URL}/drugs/inventory/value")
     print(f"Inventory Value: {response.status_code}")
 
     return True
@@ -37,13 +42,13 @@ def test_sales_endpoints():
     end_date = datetime.now().date().isoformat()
     start_date = (datetime.now() - timedelta(days=30)).date().isoformat()
 
-    response = requests.get(
+    response = session.get(
         f"{BASE_URL}/sales/analytics/period",
         params={'start_date': start_date, 'end_date': end_date}
     )
     print(f"Sales Analytics: {response.status_code}")
 
-    response = requests.get(f"{BASE_URL}/sales/analytics/top-drugs")
+    response = session.get(f"{BASE_URL}/sales/analytics/top-drugs")
     print(f"Top Drugs: {response.status_code}")
 
     return True
@@ -53,10 +58,10 @@ def test_analytics_endpoints():
     """Test analytics endpoints"""
     print("\n=== Testing Analytics Endpoints ===")
 
-    response = requests.get(f"{BASE_URL}/analytics/dashboard")
+    response = session.get(f"{BASE_URL}/analytics/dashboard")
     print(f"Dashboard: {response.status_code}")
 
-    response = requests.get(f"{BASE_URL}/analytics/inventory-health")
+    response = session.get(f"{BASE_URL}/analytics/inventory-health")
     print(f"Inventory Health: {response.status_code}")
 
     return True
@@ -66,10 +71,10 @@ def test_patient_endpoints():
     """Test patient endpoints"""
     print("\n=== Testing Patient Endpoints ===")
 
-    response = requests.get(f"{BASE_URL}/patients")
+    response = session.get(f"{BASE_URL}/patients")
     print(f"Get Patients: {response.status_code}")
 
-    response = requests.get(f"{BASE_URL}/analytics/patient-demographics")
+    response = session.get(f"{BASE_URL}/analytics/patient-demographics")
     print(f"Patient Demographics: {response.status_code}")
 
     return True
@@ -79,7 +84,7 @@ def create_sample_sale():
     """Create a sample sale transaction"""
     print("\n=== Creating Sample Sale ===")
 
-    response = requests.get(f"{BASE_URL}/drugs")
+    response = session.get(f"{BASE_URL}/drugs")
     if response.status_code == 200:
         drugs = response.json().get('drugs', [])
         if drugs:
@@ -94,7 +99,7 @@ def create_sample_sale():
                 'payment_method': 'Cash'
             }
 
-            response = requests.post(
+            response = session.post(
                 f"{BASE_URL}/sales",
                 json=sale_data,
                 headers={'Content-Type': 'application/json'}
@@ -108,30 +113,45 @@ def create_sample_sale():
     return False
 
 
+def record_result(results, test_name, run):
+    """Run or collect one test and print its outcome"""
+    try:
+        success = run()
+        results.append((test_name, success))
+        status = "PASS" if success else "FAIL"
+        print(f"{test_name}: {status}")
+    except Exception as e:
+        results.append((test_name, False))
+        print(f"{test_name}: ERROR - {str(e)}")
+
+
 def run_all_tests():
     """Run all API tests"""
     print("Starting API Tests...")
     print("=" * 50)
 
-    tests = [
+    read_tests = [
         ("Health Check", test_health),
         ("Drug Endpoints", test_drug_endpoints),
         ("Sales Endpoints", test_sales_endpoints),
         ("Analytics Endpoints", test_analytics_endpoints),
-        ("Patient Endpoints", test_patient_endpoints),
+        ("Patient Endpoints", test_patient_endpoints)
+    ]
+    write_tests = [
         ("Create Sample Sale", create_sample_sale)
     ]
 
+    # The read-only tests are independent, so overlap their requests instead of waiting on each in turn
+    with ThreadPoolExecutor(max_workers=len(read_tests)) as executor:
+        futures = [(test_name, executor.submit(test_func)) for test_name, test_func in read_tests]
+
     results = []
-    for test_name, test_func in tests:
-        try:
-            success = test_func()
-            results.append((test_name, success))
-            status = "PASS" if success else "FAIL"
-            print(f"{test_name}: {status}")
-        except Exception as e:
-            results.append((test_name, False))
-            print(f"{test_name}: ERROR - {str(e)}")
+    for test_name, future in futures:
+        record_result(results, test_name, future.result)
+
+    # Writes change what the reads see, so they run one at a time once the reads are done
+    for test_name, test_func in write_tests:
+        record_result(results, test_name, test_func)
 
     print("\n" + "=" * 50)
     print("Test Summary:")
@@ -144,5 +164,5 @@ def run_all_tests():
     print(f"\nPassed: {passed}/{total} ({passed/total*100:.1f}%)")
 
 
-+if __name__ == "__main__":
-+    run_all_tests()
+if __name__ == "__main__":
+    run_all_tests()